@@ -133,9 +133,10 @@ class GeminiService:
             logger.error(f"Erro upload: {e}")
             return None, str(e)
 
-    def list_files_in_store(self, store_name: str):
+    def list_files_in_store(self, store_name: str, raise_errors: bool = False):
         """
         Lista arquivos em um Store. Retorna lista de Documents.
+        Com raise_errors=True a falha propaga (quem cacheia não guarda [] de erro).
         """
         if not self.client:
             return []
@@ -143,6 +144,8 @@ class GeminiService:
             return self.client.file_search_stores.documents.list(parent=store_name)
         except Exception as e:
             logger.error(f"Erro list files: {e}")
+            if raise_errors:
+                raise
             return []
 
     def delete_file(self, file_name: str):
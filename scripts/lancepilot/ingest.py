@@ -16,7 +16,7 @@ sys.path.append(shared_dir)
 
 from config import REDIS_URL
 from message_buffer import buffer_message  # noqa: E402
-from saas_db import get_client_token_by_phone, get_client_config, add_message  # noqa: E402
+from saas_db import get_client_token_by_phone, get_client_config, add_message, compile_stop_triggers  # noqa: E402
 
 # Config logging
 logging.basicConfig(level=logging.INFO)
@@ -180,16 +180,8 @@ async def run_ingest():
 
                     if stop_cfg.get("active") and outgoing_text:
                         instr = stop_cfg.get("instructions", "")
-                        # Checa se o texto contem o gatilho (ex: emoji)
-                        # Logica simples: Se o gatilho estiver contido na mensagem
-                        triggers = [
-                            t.strip() for t in instr.split(",") if t.strip()
-                        ]  # Pode separar por virgula
-                        # Ou check genérico se instrução menciona algo
-                        # Vamos assumir check simples: se o texto for IGUAL ou CONTER emoji
-                        if any(t in outgoing_text for t in triggers) or (
-                            "🛑" in outgoing_text
-                        ):
+                        # Checa se o texto contem algum gatilho (separados por virgula) ou 🛑
+                        if compile_stop_triggers(instr).search(outgoing_text):
                             is_permanent_stop = True
                             logger.info(
                                 f"🛑 GATILHO DE PARADA TOTAL DETECTADO NA MENSAGEM DO ATENDENTE: {outgoing_text}"
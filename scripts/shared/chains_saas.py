@@ -15,8 +15,14 @@ import hashlib
 import psycopg
 import logging
 import asyncio
+import base64
 import sys
 
+try:
+    import pybase64  # Encoder base64 com SIMD (bem mais rápido em imagens grandes)
+except ImportError:
+    pybase64 = None
+
 # Garante acesso ao saas_db (mesmo diretório)
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 # Tenta importar clear_chat_history, fail-safe se saas_db falhar
@@ -35,6 +41,14 @@ logger = logging.getLogger("KestraChainsSaaS")
 MAX_MESSAGES = 50  # Limite de mensagens no historico antes de trimming
 
 
+def _b64encode(data: bytes) -> str:
+    """Codifica bytes em base64 (str). Usa pybase64 se instalado."""
+    if pybase64 is not None:
+        return pybase64.b64encode_as_string(data)
+    # base64 é ASCII puro: decode ascii evita a validação UTF-8
+    return base64.b64encode(data).decode("ascii")
+
+
 def _hash_tool_args(args: dict) -> str:
     """Hash determinístico dos argumentos de uma tool call."""
     canonical = json.dumps(args, sort_keys=True, default=str)
@@ -420,6 +434,8 @@ async def ask_saas(
     tools_list: list = None,
     image_base64: str = None,
     audio_bytes: bytes = None,
+    image_bytes: bytes = None,
+    image_mime: str = "image/jpeg",
 ):
     global _conn, _checkpointer  # Para poder resetar a conexão
 
@@ -435,13 +451,17 @@ async def ask_saas(
     # 2. Constrói Mensagem do Usuário (Multimodal se houver imagem)
     from langchain_core.messages import HumanMessage
 
+    if image_bytes and not image_base64:
+        # Bytes crus: o data URL exige base64, gerado fora do event loop
+        image_base64 = await asyncio.to_thread(_b64encode, image_bytes)
+
     if image_base64:
         # GPT-4o aceita lista de conteudos
         user_content = [
             {"type": "text", "text": query},
             {
                 "type": "image_url",
-                "image_url": {"url": f"data:image/jpeg;base64,{image_base64}"},
+                "image_url": {"url": f"data:{image_mime};base64,{image_base64}"},
             },
         ]
         user_message = HumanMessage(content=user_content)
@@ -1,5 +1,11 @@
 import json
 import os
+import re
+import threading
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
 from psycopg.rows import dict_row
 from psycopg_pool import ConnectionPool
 import logging
@@ -7,6 +13,55 @@ from dotenv import load_dotenv
 
 logger = logging.getLogger(__name__)
 
+try:
+    import orjson  # Serializador em Rust (2-5x mais rápido que json da stdlib)
+except ImportError:
+    orjson = None
+
+
+def _json_default(obj):
+    """Tipos fora do JSON padrão que aparecem em configs/payloads do banco."""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Tipo não serializável em JSON: {type(obj).__name__}")
+
+
+def _fast_json_dumps(obj, sort_keys: bool = False):
+    """
+    orjson com fallback para a stdlib: nada que serializava antes passa a falhar
+    (chaves não-str, Decimal, ints > 64 bits...). Retorna bytes ou str.
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        try:
+            return orjson.dumps(obj, default=_json_default, option=option)
+        except (orjson.JSONEncodeError, TypeError):
+            pass
+    # Mesmo formato compacto do orjson (sem espaços, UTF-8 sem escapes)
+    return json.dumps(
+        obj,
+        sort_keys=sort_keys,
+        separators=(",", ":"),
+        ensure_ascii=False,
+        default=_json_default,
+    )
+
+
+if orjson is not None:
+    # Jsonb(...)/Json(...) do psycopg passam a serializar via orjson (bytes direto),
+    # sempre pelo wrapper com fallback (vale para API e workers também)
+    from psycopg.types.json import set_json_dumps
+
+    set_json_dumps(_fast_json_dumps)
+
 # Configura Carga de Env (Garante que scripts achem o .env na raiz Kestra_2.0 ou acima)
 current_dir = os.path.dirname(os.path.abspath(__file__))
 # Tenta carregar do pai (Kestra_2.0) e do avô (IA)
@@ -18,6 +73,9 @@ DB_URL = os.getenv("DATABASE_CONNECTION_URI") or os.getenv("DATABASE_URL")
 
 # Pool Size configurável via ENV (default: 5 para evitar esgotar servidor)
 DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "5"))
+# Conexões mínimas mantidas abertas e tempo (s) até fechar as ociosas excedentes
+DB_POOL_MIN_SIZE = min(int(os.getenv("DB_POOL_MIN_SIZE", "1")), DB_POOL_MAX_SIZE)
+DB_POOL_MAX_IDLE = float(os.getenv("DB_POOL_MAX_IDLE", "600"))
 
 # Fallback para Streamlit Cloud Secrets (se não encontrou em env vars)
 if not DB_URL:
@@ -48,33 +106,56 @@ else:
 
 # Global Pool variable
 _pool = None
+_pool_lock = threading.Lock()
 _error_table_initialized = False
 _chat_table_initialized = False
 
 
 def get_connection():
-    """Retorna uma conexão do Pool (Context Manager Safe)."""
+    """
+    Retorna uma conexão do Pool (Context Manager Safe).
+
+    O pool é único por processo e já é aquecido no import (init_error_log_table),
+    então chamar get_connection() a cada operação só faz checkout (sem handshake).
+    Não guarde a conexão em cache (ex: st.cache_resource): ela seria compartilhada
+    entre sessões/threads e perderia o check de conexão viva do pool.
+    """
     global _pool
     if not DB_URL:
         raise ValueError("DATABASE_CONNECTION_URI não configurada!")
 
     # Initialize Pool if not exists
+    # Lock: o Streamlit roda cada sessão numa thread, e sem ele duas sessões
+    # simultâneas podiam criar pools duplicados (vazando conexões).
     if _pool is None:
-        _pool = ConnectionPool(
-            conninfo=DB_URL,
-            min_size=1,
-            max_size=DB_POOL_MAX_SIZE,  # Configurável via DB_POOL_MAX_SIZE env var
-            timeout=30.0,  # Timeout de 30s antes de desistir
-            kwargs={"row_factory": dict_row, "autocommit": True},
-            check=ConnectionPool.check_connection,  # Garante que a conexão está viva
-        )
-        logger.info(
-            f"🔌 Pool de conexões PostgreSQL inicializado (max={DB_POOL_MAX_SIZE})"
-        )
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    conninfo=DB_URL,
+                    min_size=DB_POOL_MIN_SIZE,
+                    max_size=DB_POOL_MAX_SIZE,  # Configurável via DB_POOL_MAX_SIZE env var
+                    max_idle=DB_POOL_MAX_IDLE,
+                    timeout=30.0,  # Timeout de 30s antes de desistir
+                    kwargs={"row_factory": dict_row, "autocommit": True},
+                    check=ConnectionPool.check_connection,  # Garante que a conexão está viva
+                )
+                logger.info(
+                    f"🔌 Pool de conexões PostgreSQL inicializado "
+                    f"(min={DB_POOL_MIN_SIZE}, max={DB_POOL_MAX_SIZE})"
+                )
 
     return _pool.connection()
 
 
+def dumps_json(obj, sort_keys: bool = False) -> str:
+    """
+    Serializa obj para JSON (str) para colunas JSONB. Usa orjson se instalado.
+    sort_keys=True gera saída canônica (útil para comparar configs).
+    """
+    out = _fast_json_dumps(obj, sort_keys=sort_keys)
+    return out.decode() if isinstance(out, bytes) else out
+
+
 def get_client_config(token: str):
     """
     Busca as configurações do cliente baseada no Token (Webhook/InstanceID).
@@ -562,13 +643,14 @@ def update_tools_config_db(client_id, new_config_dict):
     Atualiza o JSONB tools_config completo.
     """
     try:
-        config_json = json.dumps(new_config_dict)
+        config_json = dumps_json(new_config_dict)
 
         with get_connection() as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     "UPDATE clients SET tools_config = %s WHERE id = %s",
                     (config_json, client_id),
+                    prepare=True,
                 )
         return True
     except Exception as e:
@@ -620,6 +702,19 @@ def is_within_business_hours(tools_config: dict) -> tuple:
         return False, bh.get("off_message", "")
 
 
+@lru_cache(maxsize=256)
+def compile_stop_triggers(instructions: str):
+    """
+    Compila os gatilhos de parada (desativar_ia.instructions, separados por vírgula)
+    numa única regex de alternância, incluindo o 🛑 padrão.
+    Cacheado por texto: o split/escape só roda quando a config muda, e a checagem
+    por mensagem vira um único .search() em vez de N buscas de substring.
+    """
+    triggers = [t.strip() for t in (instructions or "").split(",") if t.strip()]
+    triggers.append("🛑")
+    return re.compile("|".join(re.escape(t) for t in triggers))
+
+
 def is_within_followup_hours(followup_config: dict) -> bool:
     """
     Verifica se o momento atual está dentro da faixa de horário permitida para follow-up.
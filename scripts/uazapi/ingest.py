@@ -16,7 +16,7 @@ sys.path.insert(
 
 from message_handler import handle_message
 from config import REDIS_URL, BUFFER_KEY_SUFIX, BUFFER_TTL
-from saas_db import get_connection, get_client_config, get_provider_config, log_event, add_message
+from saas_db import get_connection, get_client_config, get_provider_config, log_event, add_message, compile_stop_triggers
 
 # Configuração de Logger
 logging.basicConfig(level=logging.INFO)
@@ -82,12 +82,7 @@ async def run_ingest(webhook_data):
 
                         if stop_cfg.get("active") and outgoing_text:
                             instr = stop_cfg.get("instructions", "")
-                            triggers = [
-                                t.strip() for t in instr.split(",") if t.strip()
-                            ]
-                            if any(t in outgoing_text for t in triggers) or (
-                                "🛑" in outgoing_text
-                            ):
+                            if compile_stop_triggers(instr).search(outgoing_text):
                                 is_permanent_stop = True
                                 logger.info(
                                     f"🛑 GATILHO DE PARADA TOTAL DETECTADO (UAZAPI): {outgoing_text}"
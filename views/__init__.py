@@ -0,0 +1,13 @@
+"""
+Views do Streamlit.
+
+Garante uma única vez (no primeiro import de views.*) que a raiz do projeto
+está no sys.path, para os imports `scripts.*` / `api.*` das abas.
+"""
+
+import os
+import sys
+
+_root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _root_dir not in sys.path:
+    sys.path.insert(0, _root_dir)
@@ -1,18 +1,13 @@
 import streamlit as st
 import pandas as pd
+import altair as alt
 from datetime import datetime, timedelta
 import json
 import uuid
 import os
-import sys
 import subprocess
 
-# Adiciona diretório raiz ao path para imports funcionarem
-current_dir = os.path.dirname(os.path.abspath(__file__))
-root_dir = os.path.dirname(current_dir)
-if root_dir not in sys.path:
-    sys.path.insert(0, root_dir)
-
+# sys.path da raiz e ajustado uma vez em views/__init__.py
 from scripts.shared.saas_db import get_connection, clear_chat_history
 from scripts.shared.tool_registry import BUSINESS_TYPES
 
@@ -478,22 +473,32 @@ def render_admin_view():
                     cur.execute(
                         f"""
                         SELECT
-                            c.name as cliente,
-                            COALESCE(SUM(m.total_conversations), 0)::int as total_leads,
-                            COALESCE(SUM(m.resolved_by_ai), 0)::int as ia_resolveu,
-                            COALESCE(SUM(m.resolved_by_human), 0)::int as humano_resolveu,
-                            COALESCE(SUM(m.human_takeovers), 0)::int as humano_entrou,
-                            COALESCE(SUM(m.followups_sent), 0)::int as followups,
-                            COALESCE(SUM(m.followups_converted), 0)::int as followups_ok,
-                            COALESCE(SUM(m.total_messages_in), 0)::int as msgs_recebidas,
-                            COALESCE(SUM(m.total_messages_out), 0)::int as msgs_enviadas,
-                            ROUND(COALESCE(AVG(m.avg_response_time_ms), 0))::int as tempo_resposta_ms
-                        FROM metrics_daily m
-                        JOIN clients c ON m.client_id = c.id
-                        WHERE m.date >= %s AND m.date < %s
-                        {_cli_where}
-                        GROUP BY c.name
-                        ORDER BY total_leads DESC
+                            t.*,
+                            GREATEST(t.total_leads - t.ia_resolveu - t.humano_resolveu, 0) as sem_resolucao,
+                            ROUND(100.0 * t.ia_resolveu / GREATEST(t.total_leads, 1), 1)::float as taxa_ia,
+                            ROUND(
+                                100.0 * GREATEST(t.total_leads - t.ia_resolveu - t.humano_resolveu, 0)
+                                / GREATEST(t.total_leads, 1), 1
+                            )::float as taxa_perda
+                        FROM (
+                            SELECT
+                                c.name as cliente,
+                                COALESCE(SUM(m.total_conversations), 0)::int as total_leads,
+                                COALESCE(SUM(m.resolved_by_ai), 0)::int as ia_resolveu,
+                                COALESCE(SUM(m.resolved_by_human), 0)::int as humano_resolveu,
+                                COALESCE(SUM(m.human_takeovers), 0)::int as humano_entrou,
+                                COALESCE(SUM(m.followups_sent), 0)::int as followups,
+                                COALESCE(SUM(m.followups_converted), 0)::int as followups_ok,
+                                COALESCE(SUM(m.total_messages_in), 0)::int as msgs_recebidas,
+                                COALESCE(SUM(m.total_messages_out), 0)::int as msgs_enviadas,
+                                ROUND(COALESCE(AVG(m.avg_response_time_ms), 0))::int as tempo_resposta_ms
+                            FROM metrics_daily m
+                            JOIN clients c ON m.client_id = c.id
+                            WHERE m.date >= %s AND m.date < %s
+                            {_cli_where}
+                            GROUP BY c.name
+                        ) t
+                        ORDER BY t.total_leads DESC
                         """,
                         (start_date, end_date_exclusive) + _cli_params,
                     )
@@ -564,9 +569,7 @@ def render_admin_view():
 
                         # --- TABELA POR CLIENTE ---
                         st.subheader("Detalhamento por Cliente")
-                        df["sem_resolucao"] = (df["total_leads"] - df["ia_resolveu"] - df["humano_resolveu"]).clip(lower=0)
-                        df["taxa_ia"] = (df["ia_resolveu"] / df["total_leads"].replace(0, 1) * 100).round(1)
-                        df["taxa_perda"] = (df["sem_resolucao"] / df["total_leads"].replace(0, 1) * 100).round(1)
+                        # sem_resolucao / taxa_ia / taxa_perda já vêm calculados do SQL
 
                         st.dataframe(
                             df[["cliente", "total_leads", "ia_resolveu", "humano_resolveu",
@@ -756,13 +759,37 @@ def render_admin_view():
                         df_d = _sanitize_df(pd.DataFrame(daily_rows))
                         df_d["dia"] = pd.to_datetime(df_d["dia"])
                         df_d["sem_resolucao"] = (df_d["leads"] - df_d["ia_resolveu"] - df_d["humano_resolveu"]).clip(lower=0)
-                        df_dc = df_d.set_index("dia")
 
-                        st.subheader("Leads vs Quem Resolveu")
-                        st.line_chart(df_dc[["leads", "ia_resolveu", "humano_resolveu", "sem_resolucao"]])
-
-                        st.subheader("Tempo de Resposta da IA (milissegundos)")
-                        st.line_chart(df_dc[["tempo_resposta_ms"]])
+                        # Só o gráfico escolhido é montado e enviado ao navegador
+                        # (spec Vega-Lite único com apenas as colunas que ele usa)
+                        grafico = st.radio(
+                            "Visualizar",
+                            ["Leads vs Quem Resolveu", "Tempo de Resposta da IA (ms)"],
+                            horizontal=True,
+                            key="admin_daily_chart",
+                        )
+                        if grafico == "Leads vs Quem Resolveu":
+                            _series = ["leads", "ia_resolveu", "humano_resolveu", "sem_resolucao"]
+                            chart = (
+                                alt.Chart(df_d[["dia", *_series]])
+                                .transform_fold(_series, as_=["serie", "total"])
+                                .mark_line()
+                                .encode(
+                                    x=alt.X("dia:T", title=None),
+                                    y=alt.Y("total:Q", title=None),
+                                    color=alt.Color("serie:N", title=None, sort=_series),
+                                )
+                            )
+                        else:
+                            chart = (
+                                alt.Chart(df_d[["dia", "tempo_resposta_ms"]])
+                                .mark_line()
+                                .encode(
+                                    x=alt.X("dia:T", title=None),
+                                    y=alt.Y("tempo_resposta_ms:Q", title=None),
+                                )
+                            )
+                        st.altair_chart(chart, width="stretch")
                     else:
                         st.info("Sem dados diarios no periodo.")
         except Exception as e:
@@ -0,0 +1,45 @@
+import asyncio
+import concurrent.futures
+import logging
+import threading
+
+import streamlit as st
+
+logger = logging.getLogger(__name__)
+
+
+@st.cache_resource
+def bg_loop():
+    """
+    Event loop único do processo, rodando numa thread daemon.
+    Compartilhado pelas abas do dashboard (sem asyncio.run() por chamada):
+    mantém pools HTTP/TLS dos clientes async entre reruns.
+    """
+    loop = asyncio.new_event_loop()
+    threading.Thread(
+        target=loop.run_forever, name="dashboard-loop", daemon=True
+    ).start()
+    return loop
+
+
+def run_async(coro):
+    """Executa a coroutine no loop de background e espera o resultado."""
+    return asyncio.run_coroutine_threadsafe(coro, bg_loop()).result()
+
+
+def run_async_with_timeout(coro, label: str, timeout: float):
+    """
+    Executa a coroutine no loop de background esperando no máximo `timeout` s.
+    Se estourar, ela segue rodando (erros vão para o log) e retorna None.
+    """
+
+    def _log_error(fut):
+        if not fut.cancelled() and fut.exception():
+            logger.error(f"Erro em {label}: {fut.exception()}")
+
+    fut = asyncio.run_coroutine_threadsafe(coro, bg_loop())
+    fut.add_done_callback(_log_error)
+    try:
+        return fut.result(timeout=timeout)
+    except concurrent.futures.TimeoutError:
+        return None
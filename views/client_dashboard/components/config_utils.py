@@ -0,0 +1,106 @@
+import hashlib
+
+import streamlit as st
+from psycopg.types.json import Jsonb
+
+from scripts.shared.saas_db import (
+    dumps_json,
+    get_connection,
+    get_provider_config,
+    upsert_provider_config,
+)
+
+_HASH_KEY = "_tools_cfg_hash"
+
+
+def json_hash(json_str: str) -> str:
+    """Hash curto (blake2b, 16 bytes) de uma string JSON."""
+    return hashlib.blake2b(json_str.encode(), digest_size=16).hexdigest()
+
+
+def loaded_config_hash(user_data: dict) -> str:
+    """
+    Hash do tools_config carregado em user_data.
+    Fica em cache no session_state, amarrado ao objeto dict atual: se outra
+    aba substituir user_data["tools_config"], o hash é recalculado.
+    """
+    cfg = user_data.get("tools_config") or {}
+    cached = st.session_state.get(_HASH_KEY)
+    if cached and cached[0] is cfg:
+        return cached[1]
+    cfg_hash = json_hash(dumps_json(cfg, sort_keys=True))
+    st.session_state[_HASH_KEY] = (cfg, cfg_hash)
+    return cfg_hash
+
+
+def remember_config_hash(cfg: dict, cfg_hash: str):
+    """Guarda o hash do tools_config recém-salvo (evita recalcular no próximo save)."""
+    st.session_state[_HASH_KEY] = (cfg, cfg_hash)
+
+
+def save_tools_config_many(
+    user_data: dict,
+    patches: dict,
+    success_msg: str = "Configuracao salva com sucesso!",
+    unchanged_msg: str = "Nada a salvar: configuracao inalterada.",
+):
+    """
+    Caminho único de gravação de clients.tools_config: aplica várias chaves
+    (patches) numa única UPDATE e atualiza user_data/session_state.
+    Pula o banco se nada mudou (hash do JSON canônico).
+    Mensagens None não são exibidas.
+    Retorna True se salvou, False se inalterado, None em caso de erro.
+    """
+    new_tools_config = {**(user_data.get("tools_config") or {}), **patches}
+
+    # Serializa uma vez: a mesma string serve para o hash e para o UPDATE
+    new_json = dumps_json(new_tools_config, sort_keys=True)
+    new_hash = json_hash(new_json)
+    if new_hash == loaded_config_hash(user_data):
+        if unchanged_msg:
+            st.info(unchanged_msg)
+        return False
+
+    try:
+        with get_connection() as conn:
+            with conn.cursor() as cur:
+                # prepare=True: statement preparado no servidor (sem re-plan por save)
+                # Jsonb reaproveita o JSON já serializado para o hash
+                cur.execute(
+                    "UPDATE clients SET tools_config = %s WHERE id = %s "
+                    "RETURNING tools_config",
+                    (
+                        Jsonb(new_tools_config, dumps=lambda _: new_json),
+                        user_data["id"],
+                    ),
+                    prepare=True,
+                )
+                row = cur.fetchone()
+        # user_data é o próprio dict do session_state: não precisa reatribuir
+        user_data["tools_config"] = row["tools_config"] if row else new_tools_config
+        remember_config_hash(user_data["tools_config"], new_hash)
+        if success_msg:
+            st.success(success_msg)
+        return True
+    except Exception as e:
+        st.error(f"Erro ao salvar: {e}")
+        return None
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def cached_provider_config(client_id: str, provider_type: str) -> dict:
+    """get_provider_config com cache curto (evita ida ao banco a cada rerun)."""
+    return get_provider_config(client_id, provider_type) or {}
+
+
+def save_provider_config(client_id: str, provider_type: str, **kwargs):
+    """
+    Caminho único de gravação de client_providers pelo dashboard:
+    upsert + limpeza só da entrada (client_id, provider_type) do cache.
+    Exceções do banco propagam para a aba exibir.
+    """
+    provider_id = upsert_provider_config(
+        client_id=client_id, provider_type=provider_type, **kwargs
+    )
+    cached_provider_config.clear(client_id, provider_type)
+    return provider_id
@@ -1,21 +1,25 @@
+import html
 import streamlit as st
-import datetime
+from datetime import date
 
 
-def format_contact_label(chat_id, last_message_at, last_role, last_context=""):
+@st.cache_data(max_entries=2048, show_spinner=False)
+def format_contact_label(
+    chat_id, last_message_at, last_role, last_context="", today=None
+):
     """
     Cria um label rico para o botão do contato.
     Como o Streamlit não permite HTML complexo dentro de botões nativos,
     usamos formatação de texto inteligente e emojis.
+    Função pura dos argumentos: cacheada para não recalcular a cada rerun.
+    `today` entra na chave do cache, então a virada do dia gera labels novos.
     """
     # 1. Formata Hora
     time_str = ""
     if last_message_at:
         try:
             # Se for hoje, mostra hora. Se não, mostra data
-            now = datetime.datetime.now()
-            diff = now - last_message_at
-            if diff.days == 0:
+            if last_message_at.date() == (today or date.today()):
                 time_str = last_message_at.strftime("%H:%M")
             else:
                 time_str = last_message_at.strftime("%d/%m")
@@ -86,12 +90,19 @@ def render_message_bubble(role: str, content: str, created_at=None, avatar_url=N
 def render_chat_header(active_chat_id):
     """
     Renderiza o cabeçalho da área de chat.
+    Um único st.markdown (flex HTML) em vez de colunas + markdown + caption + divider.
     """
-    col_avatar, col_info = st.columns([1, 8])
-    with col_avatar:
-        # Placeholder de Avatar (Pode ser substituido pela foto do perfil do WhatsApp se tivermos)
-        st.markdown("👤", unsafe_allow_html=True)
-    with col_info:
-        st.markdown(f"**{active_chat_id}**")
-        st.caption("Online via WhatsApp Oficial")
-    st.divider()
+    # Placeholder de Avatar (Pode ser substituido pela foto do perfil do WhatsApp se tivermos)
+    st.markdown(
+        f"""
+        <div style="display:flex;align-items:center;gap:12px">
+            <div style="font-size:28px">👤</div>
+            <div>
+                <strong>{html.escape(str(active_chat_id))}</strong>
+                <div style="color:#667781;font-size:12px">Online via WhatsApp Oficial</div>
+            </div>
+        </div>
+        <hr/>
+        """,
+        unsafe_allow_html=True,
+    )
@@ -13,22 +13,37 @@ from views.client_dashboard.tabs.monitoring_tab import render_monitoring_tab
 from views.client_dashboard.tabs.business_hours_tab import render_business_hours_tab
 from views.client_dashboard.tabs.llm_config_tab import render_llm_config_tab
 from views.client_dashboard.tabs.attlas_tab import render_attlas_tab
+from views.client_dashboard.components.config_utils import save_tools_config_many
+from scripts.shared.saas_db import is_within_business_hours
 
 # Configure Logger
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Importado uma vez no load do módulo (não a cada rerun).
+# Se falhar, o dashboard segue funcionando sem os serviços de IA.
+try:
+    from api.services.gemini_service import GeminiService
+except Exception as e:
+    GeminiService = None
+    logger.error(f"Failed to import GeminiService: {e}")
+
 
 def render_client_dashboard(user_data):
     """
     Main Entry Point for the Client Dashboard (Modularized).
     Refactored to use Sidebar Navigation for a cleaner SaaS look.
     """
+    # Locais lidos uma vez por rerun
+    uname = user_data.get("name", "")
+    store_id = user_data.get("store_id", "Não configurado")
+    tools_cfg = user_data.get("tools_config") or {}
+
     # 1. Initialize Services (Gemini)
     gemini_manager = None
     try:
-        from api.services.gemini_service import GeminiService
-
+        if GeminiService is None:
+            raise ImportError("api.services.gemini_service indisponível")
         gemini_manager = GeminiService()
     except Exception as e:
         logger.error(f"Failed to initialize GeminiService: {e}")
@@ -38,7 +53,7 @@ def render_client_dashboard(user_data):
     with st.sidebar:
         # User Profile Header
         st.title("🤖 AIAHUB")
-        st.caption(f"Bem-vindo, {user_data.get('name')}")
+        st.caption(f"Bem-vindo, {uname}")
         st.divider()
 
         # Navigation Menu
@@ -69,7 +84,6 @@ def render_client_dashboard(user_data):
         # Global Controls
         st.subheader("Controles Globais")
         # AI Toggle
-        tools_cfg = user_data.get("tools_config", {})
         current_ai_status = tools_cfg.get("ai_active", True)
 
         new_ai_status = st.toggle(
@@ -78,13 +92,14 @@ def render_client_dashboard(user_data):
         )
 
         if new_ai_status != current_ai_status:
-            from scripts.shared.saas_db import update_tools_config_db
-
-            tools_cfg["ai_active"] = new_ai_status
-            update_tools_config_db(user_data["id"], tools_cfg)
-            user_data["tools_config"] = tools_cfg
-            st.session_state["user_data"] = user_data
-            st.rerun()
+            # Mesmo caminho de gravação das abas (atualiza user_data e o hash)
+            if save_tools_config_many(
+                user_data,
+                {"ai_active": new_ai_status},
+                success_msg=None,
+                unchanged_msg=None,
+            ):
+                st.rerun()
 
         # LLM Model indicator
         llm_cfg = tools_cfg.get("llm_config", {})
@@ -94,8 +109,6 @@ def render_client_dashboard(user_data):
         # Business Hours status indicator
         bh_cfg = tools_cfg.get("business_hours", {})
         if bh_cfg.get("active"):
-            from scripts.shared.saas_db import is_within_business_hours
-
             is_open, _ = is_within_business_hours(tools_cfg)
             if is_open:
                 st.caption("Horario: Dentro do expediente")
@@ -111,7 +124,7 @@ def render_client_dashboard(user_data):
     # Render based on selection
 
     # Header Info (Store ID)
-    st.caption(f"Knowledge Base ID: {user_data.get('store_id', 'Não configurado')}")
+    st.caption(f"Knowledge Base ID: {store_id}")
 
     if selected_page == "📂 Meus Arquivos (RAG)":
         st.title("📂 Meus Arquivos")
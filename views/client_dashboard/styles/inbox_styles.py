@@ -39,6 +39,25 @@ def get_inbox_css():
         outline: none !important;
     }
     
+    /* Lista de contatos renderizada como st.radio (um único widget).
+       Escopo pela key do widget (classe st-key-*): não afeta os outros radios */
+    .st-key-inbox_contact_list div[role="radiogroup"] > label {
+        width: 100%;
+        border-bottom: 1px solid #f0f2f5;
+        padding: 15px 10px;
+        margin: 0;
+        white-space: pre-line;
+        transition: background-color 0.2s;
+    }
+
+    .st-key-inbox_contact_list div[role="radiogroup"] > label:hover {
+        background-color: #f5f6f6;
+    }
+
+    .st-key-inbox_contact_list div[role="radiogroup"] > label:has(input:checked) {
+        background-color: #e9edef;
+    }
+
     /* Pequeno texto (hora) dentro do botão - Hack via CSS gerado dinamicamente no label */
     
     /* 3. ÁREA DE CHAT (COLUNA DIREITA) */
@@ -6,19 +6,40 @@ regras de Lead Scoring. As regras sao convertidas automaticamente
 em instrucoes injetadas no prompt da IA.
 """
 
-import json
-import copy
-import os
-import sys
+import io
+import pandas as pd
 import streamlit as st
 
-# Ensure root dir is in path for imports
-current_dir = os.path.dirname(os.path.abspath(__file__))
-root_dir = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
-if root_dir not in sys.path:
-    sys.path.insert(0, root_dir)
+# sys.path da raiz e ajustado uma vez em views/__init__.py
+from views.client_dashboard.components.config_utils import save_tools_config_many
 
-from scripts.shared.saas_db import get_connection
+
+# Campos de cada regra (ordem usada na assinatura hashavel do cache)
+_QUAL_FIELDS = ("name", "condition", "project_uuid", "target_column", "also_score")
+_SCORE_FIELDS = ("trigger", "points", "reason")
+
+# Valores default de cada coluna dos editores de regras
+_NEW_QUAL_RULE = {
+    "name": "",
+    "condition": "",
+    "project_uuid": "",
+    "target_column": "",
+    "also_score": 0,
+}
+_NEW_SCORE_RULE = {"trigger": "", "points": 10, "reason": ""}
+
+# Legenda da classificacao A/B/C/D (texto estatico, montado uma vez no import)
+_SCORING_LEGEND_MD = """\
+| Faixa | Classificacao | Temperatura | Significado |
+|-------|:---:|:---:|---|
+| 0 - 25 | **D** | Frio | Lead frio, pouco interesse |
+| 26 - 50 | **C** | Morno | Algum interesse, precisa nurturing |
+| 51 - 75 | **B** | Quente | Bom interesse, em negociacao |
+| 76 - 100 | **A** | Muito Quente | Pronto para fechar |
+
+A pontuacao e **cumulativa**: cada interacao na conversa pode somar ou subtrair pontos.
+A IA usa `attlas_adicionar_pontuacao(points, reason)` automaticamente conforme as regras abaixo.
+"""
 
 
 def render_attlas_tab(user_data):
@@ -28,10 +49,7 @@ def render_attlas_tab(user_data):
         "tags e muito mais — tudo via conversa no WhatsApp."
     )
 
-    t_config = user_data.get("tools_config", {}) or {}
-    attlas_cfg = t_config.get("attlas_crm", {})
-    if isinstance(attlas_cfg, bool):
-        attlas_cfg = {"active": attlas_cfg}
+    attlas_cfg = _load_attlas_cfg(user_data)
 
     # --- Toggle principal ---
     attlas_active = st.toggle(
@@ -44,270 +62,258 @@ def render_attlas_tab(user_data):
     if not attlas_active:
         st.info("Ative a integracao para configurar credenciais e ferramentas.")
         if st.button("Salvar", key="attlas_save_off"):
-            new_tools = t_config.copy()
-            new_tools["attlas_crm"] = {"active": False}
-            _save_tools_config(user_data, new_tools)
+            save_tools_config_many(user_data, {"attlas_crm": {"active": False}})
         return
 
     st.divider()
+    _render_attlas_config(user_data)
 
-    # =====================================================
-    # SECAO 1: Credenciais
-    # =====================================================
-    st.subheader("Credenciais")
-
-    col_url, col_token = st.columns(2)
-    with col_url:
-        base_url = st.text_input(
-            "URL do Tenant",
-            value=attlas_cfg.get("base_url", ""),
-            placeholder="https://empresa.attlascrm.com",
-            help="URL base do seu tenant no Attlas CRM (sem barra no final).",
-            key="attlas_base_url",
-        )
-    with col_token:
-        token = st.text_input(
-            "Token Sanctum (Bearer)",
-            value=attlas_cfg.get("token", ""),
-            type="password",
-            help="Token de API gerado via POST /api/v1/auth-token.",
-            key="attlas_token",
-        )
-
-    st.divider()
 
-    # =====================================================
-    # SECAO 2: Regras de Qualificacao (Kanban Move)
-    # =====================================================
-    st.subheader("Regras de Qualificacao (Mover no Kanban)")
-    st.caption(
-        "Defina criterios que, quando atendidos na conversa, fazem a IA "
-        "mover o card automaticamente para outra coluna do Kanban."
+@st.fragment
+def _render_attlas_config(user_data: dict):
+    """
+    Form de configuracao + preview, isolados num fragment: o submit reexecuta
+    apenas este trecho, nao o dashboard inteiro (sidebar, header, toggle).
+    Le tools_config de user_data a cada execucao para nao usar valores antigos
+    nos reruns do fragment.
+    """
+    uid = user_data["id"]
+    attlas_cfg = _load_attlas_cfg(user_data)
+
+    # Editores de regras so sao montados sob demanda: quem so visualiza a aba
+    # nao paga a construcao dos DataFrames + data_editor.
+    editing_rules = st.toggle(
+        "Editar regras de qualificacao e score",
+        value=False,
+        key=f"attlas_edit_rules_{uid}",
+        help="Desativar sem salvar descarta as alteracoes nas regras.",
     )
 
-    # Session state para regras de qualificacao
-    qual_key = f"attlas_qual_rules_{user_data['id']}"
-    if qual_key not in st.session_state:
-        st.session_state[qual_key] = copy.deepcopy(
-            attlas_cfg.get("qualification_rules", [])
-        )
-
-    qual_rules = st.session_state[qual_key]
-
-    qual_to_remove = []
-    for i, rule in enumerate(qual_rules):
-        with st.expander(
-            f"Regra {i + 1}: {rule.get('name', 'Nova regra')}",
-            expanded=(i == len(qual_rules) - 1),
-        ):
-            rule["name"] = st.text_input(
-                "Nome da regra",
-                value=rule.get("name", ""),
-                placeholder="Ex: Lead Qualificado (BANT)",
-                key=f"qual_name_{user_data['id']}_{i}",
+    # Dentro de um st.form: editar campos nao dispara rerun, so o submit.
+    with st.form("attlas_form", clear_on_submit=False):
+        # =====================================================
+        # SECAO 1: Credenciais
+        # =====================================================
+        st.subheader("Credenciais")
+
+        col_url, col_token = st.columns(2)
+        with col_url:
+            base_url = st.text_input(
+                "URL do Tenant",
+                value=attlas_cfg.get("base_url", ""),
+                placeholder="https://empresa.attlascrm.com",
+                help="URL base do seu tenant no Attlas CRM (sem barra no final).",
+                key="attlas_base_url",
             )
-
-            rule["condition"] = st.text_area(
-                "Quando mover? (condicao)",
-                value=rule.get("condition", ""),
-                height=80,
-                placeholder=(
-                    "Ex: Quando o lead confirmar que tem orcamento acima de R$ 5.000, "
-                    "prazo menor que 30 dias, e que ele mesmo decide a compra."
-                ),
-                key=f"qual_cond_{user_data['id']}_{i}",
-                help="Descreva em linguagem natural a condicao para mover.",
+        with col_token:
+            token = st.text_input(
+                "Token Sanctum (Bearer)",
+                value=attlas_cfg.get("token", ""),
+                type="password",
+                help="Token de API gerado via POST /api/v1/auth-token.",
+                key="attlas_token",
             )
 
-            col_proj, col_col = st.columns(2)
-            with col_proj:
-                rule["project_uuid"] = st.text_input(
-                    "UUID do Projeto",
-                    value=rule.get("project_uuid", ""),
-                    placeholder="abc-123-def-456",
-                    key=f"qual_proj_{user_data['id']}_{i}",
-                    help="UUID do projeto/pipeline no Attlas.",
-                )
-            with col_col:
-                rule["target_column"] = st.text_input(
-                    "Nome da coluna destino",
-                    value=rule.get("target_column", ""),
-                    placeholder="Ex: Qualificado, Em Negociacao, Ganho",
-                    key=f"qual_col_{user_data['id']}_{i}",
-                    help="Nome da coluna para onde o card sera movido.",
-                )
-
-            rule["also_score"] = st.number_input(
-                "Pontos de score ao mover (opcional)",
-                value=int(rule.get("also_score", 0)),
-                min_value=-100,
-                max_value=100,
-                key=f"qual_score_{user_data['id']}_{i}",
-                help="Pontuacao extra ao mover. 0 = nao pontuar. Positivo = aquecer. Negativo = esfriar.",
-            )
+        st.divider()
 
-            if st.button("Remover regra", key=f"qual_rem_{user_data['id']}_{i}"):
-                qual_to_remove.append(i)
-
-    if qual_to_remove:
-        for idx in sorted(qual_to_remove, reverse=True):
-            del st.session_state[qual_key][idx]
-        st.rerun()
-
-    if st.button("Adicionar regra de qualificacao", key="qual_add"):
-        st.session_state[qual_key].append(
-            {
-                "name": "",
-                "condition": "",
-                "project_uuid": "",
-                "target_column": "",
-                "also_score": 0,
-            }
+        # =====================================================
+        # SECAO 2: Regras de Qualificacao (Kanban Move)
+        # =====================================================
+        st.subheader("Regras de Qualificacao (Mover no Kanban)")
+        st.caption(
+            "Defina criterios que, quando atendidos na conversa, fazem a IA "
+            "mover o card automaticamente para outra coluna do Kanban. "
+            "Use o + da tabela para adicionar regras e selecione linhas para remover."
         )
-        st.rerun()
-
-    st.divider()
-
-    # =====================================================
-    # SECAO 3: Regras de Lead Scoring
-    # =====================================================
-    st.subheader("Regras de Lead Scoring")
-    st.caption(
-        "Defina criterios que aumentam ou diminuem a pontuacao do lead. "
-        "A IA aplica automaticamente durante a conversa."
-    )
 
-    # Explicacao da classificacao
-    with st.expander("Entenda a classificacao A/B/C/D", expanded=False):
-        st.markdown("""
-| Faixa | Classificacao | Temperatura | Significado |
-|-------|:---:|:---:|---|
-| 0 - 25 | **D** | Frio | Lead frio, pouco interesse |
-| 26 - 50 | **C** | Morno | Algum interesse, precisa nurturing |
-| 51 - 75 | **B** | Quente | Bom interesse, em negociacao |
-| 76 - 100 | **A** | Muito Quente | Pronto para fechar |
-
-A pontuacao e **cumulativa**: cada interacao na conversa pode somar ou subtrair pontos.
-A IA usa `attlas_adicionar_pontuacao(points, reason)` automaticamente conforme as regras abaixo.
-""")
-
-    # Session state para regras de score
-    score_key = f"attlas_score_rules_{user_data['id']}"
-    if score_key not in st.session_state:
-        st.session_state[score_key] = copy.deepcopy(
-            attlas_cfg.get("scoring_rules", [])
+        if editing_rules:
+            # Um unico data_editor no lugar de ~5 widgets por regra
+            edited_qual = st.data_editor(
+                pd.DataFrame(
+                    attlas_cfg.get("qualification_rules", []), columns=list(_QUAL_FIELDS)
+                ),
+                column_config={
+                    "name": st.column_config.TextColumn(
+                        "Nome da regra", help="Ex: Lead Qualificado (BANT)"
+                    ),
+                    "condition": st.column_config.TextColumn(
+                        "Quando mover? (condicao)",
+                        help="Descreva em linguagem natural a condicao para mover.",
+                        width="large",
+                    ),
+                    "project_uuid": st.column_config.TextColumn(
+                        "UUID do Projeto", help="UUID do projeto/pipeline no Attlas."
+                    ),
+                    "target_column": st.column_config.TextColumn(
+                        "Coluna destino",
+                        help="Nome da coluna para onde o card sera movido.",
+                    ),
+                    "also_score": st.column_config.NumberColumn(
+                        "Pontos ao mover",
+                        help="Pontuacao extra ao mover. 0 = nao pontuar. Positivo = aquecer. Negativo = esfriar.",
+                        min_value=-100,
+                        max_value=100,
+                        step=1,
+                        default=0,
+                    ),
+                },
+                num_rows="dynamic",
+                hide_index=True,
+                width="stretch",
+                key=f"attlas_qual_editor_{uid}",
+            )
+            qual_rules = _editor_rules(edited_qual, _NEW_QUAL_RULE)
+        else:
+            # Somente leitura: usa as regras salvas, sem montar o editor
+            qual_rules = attlas_cfg.get("qualification_rules", [])
+            st.write(f"{len(qual_rules)} regra(s) de qualificacao configurada(s).")
+
+        st.divider()
+
+        # =====================================================
+        # SECAO 3: Regras de Lead Scoring
+        # =====================================================
+        st.subheader("Regras de Lead Scoring")
+        st.caption(
+            "Defina criterios que aumentam ou diminuem a pontuacao do lead. "
+            "A IA aplica automaticamente durante a conversa."
         )
 
-    score_rules = st.session_state[score_key]
-
-    score_to_remove = []
-    for i, rule in enumerate(score_rules):
-        with st.expander(
-            f"Regra {i + 1}: {rule.get('trigger', 'Nova regra')} ({_format_points(rule.get('points', 0))})",
-            expanded=(i == len(score_rules) - 1),
-        ):
-            rule["trigger"] = st.text_input(
-                "Gatilho (quando pontuar)",
-                value=rule.get("trigger", ""),
-                placeholder="Ex: Lead informou orcamento acima de R$ 10.000",
-                key=f"score_trigger_{user_data['id']}_{i}",
-                help="Descreva a situacao que gera pontuacao.",
-            )
+        # Explicacao da classificacao
+        with st.expander("Entenda a classificacao A/B/C/D", expanded=False):
+            st.markdown(_SCORING_LEGEND_MD)
 
-            col_pts, col_reason = st.columns([1, 2])
-            with col_pts:
-                rule["points"] = st.number_input(
-                    "Pontos",
-                    value=int(rule.get("points", 10)),
-                    min_value=-100,
-                    max_value=100,
-                    key=f"score_pts_{user_data['id']}_{i}",
-                    help="Positivo = aquecer lead. Negativo = esfriar.",
-                )
-            with col_reason:
-                rule["reason"] = st.text_input(
-                    "Motivo registrado no historico",
-                    value=rule.get("reason", ""),
-                    placeholder="Ex: Orcamento alto confirmado",
-                    key=f"score_reason_{user_data['id']}_{i}",
-                    help="Esse texto aparece no historico do score do card.",
-                )
-
-            if st.button("Remover regra", key=f"score_rem_{user_data['id']}_{i}"):
-                score_to_remove.append(i)
-
-    if score_to_remove:
-        for idx in sorted(score_to_remove, reverse=True):
-            del st.session_state[score_key][idx]
-        st.rerun()
-
-    if st.button("Adicionar regra de score", key="score_add"):
-        st.session_state[score_key].append(
-            {"trigger": "", "points": 10, "reason": ""}
+        if editing_rules:
+            edited_score = st.data_editor(
+                pd.DataFrame(
+                    attlas_cfg.get("scoring_rules", []), columns=list(_SCORE_FIELDS)
+                ),
+                column_config={
+                    "trigger": st.column_config.TextColumn(
+                        "Gatilho (quando pontuar)",
+                        help="Descreva a situacao que gera pontuacao.",
+                        width="large",
+                    ),
+                    "points": st.column_config.NumberColumn(
+                        "Pontos",
+                        help="Positivo = aquecer lead. Negativo = esfriar.",
+                        min_value=-100,
+                        max_value=100,
+                        step=1,
+                        default=10,
+                    ),
+                    "reason": st.column_config.TextColumn(
+                        "Motivo registrado no historico",
+                        help="Esse texto aparece no historico do score do card.",
+                    ),
+                },
+                num_rows="dynamic",
+                hide_index=True,
+                width="stretch",
+                key=f"attlas_score_editor_{uid}",
+            )
+            score_rules = _editor_rules(edited_score, _NEW_SCORE_RULE)
+        else:
+            score_rules = attlas_cfg.get("scoring_rules", [])
+            st.write(f"{len(score_rules)} regra(s) de score configurada(s).")
+
+        st.divider()
+
+        # =====================================================
+        # SECAO 4: Instrucoes adicionais (livre)
+        # =====================================================
+        st.subheader("Instrucoes adicionais para a IA")
+        st.caption(
+            "Instrucoes extras alem das regras acima. "
+            "Ex: como a IA deve se comportar ao consultar o Kanban, criar cards, etc."
         )
-        st.rerun()
-
-    st.divider()
 
-    # =====================================================
-    # SECAO 4: Instrucoes adicionais (livre)
-    # =====================================================
-    st.subheader("Instrucoes adicionais para a IA")
-    st.caption(
-        "Instrucoes extras alem das regras acima. "
-        "Ex: como a IA deve se comportar ao consultar o Kanban, criar cards, etc."
-    )
+        extra_instructions = st.text_area(
+            "Instrucoes adicionais",
+            value=attlas_cfg.get("extra_instructions", ""),
+            height=100,
+            placeholder=(
+                "Ex: Sempre pergunte o nome e telefone antes de criar um card. "
+                "Quando o lead fechar negocio, registre como 'ganho' com o valor."
+            ),
+            key="attlas_extra_instructions",
+        )
 
-    extra_instructions = st.text_area(
-        "Instrucoes adicionais",
-        value=attlas_cfg.get("extra_instructions", ""),
-        height=100,
-        placeholder=(
-            "Ex: Sempre pergunte o nome e telefone antes de criar um card. "
-            "Quando o lead fechar negocio, registre como 'ganho' com o valor."
-        ),
-        key="attlas_extra_instructions",
-    )
+        submitted = st.form_submit_button(
+            "Salvar Configuracao Attlas", type="primary"
+        )
 
     st.divider()
 
     # =====================================================
     # PREVIEW: Instrucoes geradas
     # =====================================================
-    generated = _generate_instructions(qual_rules, score_rules, extra_instructions)
+    generated = _generate_instructions_cached(
+        _rules_signature(qual_rules, score_rules, extra_instructions)
+    )
 
-    with st.expander("Preview: instrucoes que serao injetadas no prompt da IA", expanded=False):
+    # Toggle em vez de expander: o expander fechado ainda envia o bloco de
+    # codigo inteiro ao navegador a cada rerun; aqui so quando pedido.
+    if st.toggle(
+        "Preview: instrucoes que serao injetadas no prompt da IA",
+        value=False,
+        key="attlas_preview_show",
+    ):
         st.code(generated, language="markdown")
 
-    st.divider()
-
     # =====================================================
     # SALVAR
     # =====================================================
-    if st.button("Salvar Configuracao Attlas", type="primary", key="attlas_save"):
-        if attlas_active and (not base_url or not token):
+    if submitted:
+        if not base_url or not token:
             st.warning("Preencha a URL do Tenant e o Token para ativar.")
             return
 
         new_cfg = {
-            "active": attlas_active,
+            "active": True,
             "base_url": base_url.rstrip("/") if base_url else "",
             "token": token,
-            "qualification_rules": st.session_state[qual_key],
-            "scoring_rules": st.session_state[score_key],
+            "qualification_rules": qual_rules,
+            "scoring_rules": score_rules,
             "extra_instructions": extra_instructions,
             # Gera instrucoes consolidadas para injecao no prompt
             "instructions": generated,
         }
 
-        new_tools = t_config.copy()
-        new_tools["attlas_crm"] = new_cfg
-        _save_tools_config(user_data, new_tools)
+        save_tools_config_many(user_data, {"attlas_crm": new_cfg})
 
 
 # ─── Helpers ──────────────────────────────────────────────────────────
 
 
+def _load_attlas_cfg(user_data: dict) -> dict:
+    """Retorna tools_config.attlas_crm normalizado (bool legado vira dict)."""
+    t_config = user_data.get("tools_config", {}) or {}
+    attlas_cfg = t_config.get("attlas_crm", {})
+    if isinstance(attlas_cfg, bool):
+        attlas_cfg = {"active": attlas_cfg}
+    return attlas_cfg
+
+
+def _editor_rules(df: pd.DataFrame, defaults: dict) -> list:
+    """
+    Converte as linhas do st.data_editor de volta em lista de dicts.
+    Celulas vazias viram o valor default; linhas totalmente vazias sao ignoradas.
+    """
+    rules = []
+    for row in df.to_dict("records"):
+        rule = {}
+        for field, default in defaults.items():
+            value = row.get(field)
+            # value != value detecta NaN (celula numerica vazia)
+            if value is None or value != value:
+                value = default
+            rule[field] = type(default)(value)
+        if rule != defaults:
+            rules.append(rule)
+    return rules
+
+
 def _format_points(points: int) -> str:
     """Formata pontos com sinal."""
     if points > 0:
@@ -325,63 +331,85 @@ def _generate_instructions(
     Este texto e salvo em attlas_crm.instructions e injetado no prompt da IA
     automaticamente pelo loop generico do rag_worker.
     """
-    parts = []
-
-    # Qualificacao
-    valid_qual = [r for r in qual_rules if r.get("condition") and r.get("target_column")]
-    if valid_qual:
-        parts.append("=== REGRAS DE QUALIFICACAO (MOVER NO KANBAN) ===")
-        for i, rule in enumerate(valid_qual, 1):
-            name = rule.get("name") or f"Regra {i}"
-            parts.append(f"\n{i}. [{name}]")
-            parts.append(f"   QUANDO: {rule['condition']}")
-            parts.append(
-                f"   ACAO: Use attlas_mover_card_simples para mover o card para a coluna \"{rule['target_column']}\"."
+    # Cada linha e escrita ja com "\n"; o ultimo e removido no final
+    # (mesmo resultado do antigo "\n".join(parts), sem a lista intermediaria).
+    buf = io.StringIO()
+    w = buf.write
+
+    # Qualificacao (passada unica: filtra e numera no mesmo loop)
+    i = 0
+    for rule in qual_rules:
+        if not (rule.get("condition") and rule.get("target_column")):
+            continue
+        i += 1
+        if i == 1:
+            w("=== REGRAS DE QUALIFICACAO (MOVER NO KANBAN) ===\n")
+        name = rule.get("name") or f"Regra {i}"
+        w(
+            f"\n{i}. [{name}]\n"
+            f"   QUANDO: {rule['condition']}\n"
+            f"   ACAO: Use attlas_mover_card_simples para mover o card para a coluna \"{rule['target_column']}\".\n"
+        )
+        if rule.get("project_uuid"):
+            w(f"   PROJETO UUID: {rule['project_uuid']}\n")
+        score = rule.get("also_score", 0)
+        if score != 0:
+            w(
+                f"   SCORE: Tambem use attlas_adicionar_pontuacao com {_format_points(score)} "
+                f"e motivo \"{name}\".\n"
             )
-            if rule.get("project_uuid"):
-                parts.append(f"   PROJETO UUID: {rule['project_uuid']}")
-            score = rule.get("also_score", 0)
-            if score != 0:
-                parts.append(
-                    f"   SCORE: Tambem use attlas_adicionar_pontuacao com {_format_points(score)} "
-                    f"e motivo \"{name}\"."
-                )
-        parts.append("")
+    if i:
+        w("\n")
 
     # Scoring
-    valid_score = [r for r in score_rules if r.get("trigger")]
-    if valid_score:
-        parts.append("=== REGRAS DE LEAD SCORING ===")
-        parts.append("Classificacao: D (0-25), C (26-50), B (51-75), A (76-100)")
-        parts.append(
-            "Use attlas_adicionar_pontuacao(card_uuid, points, reason) automaticamente:"
-        )
-        parts.append("")
-        for rule in valid_score:
-            pts = rule.get("points", 0)
-            reason = rule.get("reason") or rule["trigger"]
-            parts.append(f"- {rule['trigger']} -> {_format_points(pts)} (motivo: \"{reason}\")")
-        parts.append("")
+    has_score = False
+    for rule in score_rules:
+        if not rule.get("trigger"):
+            continue
+        if not has_score:
+            has_score = True
+            w(
+                "=== REGRAS DE LEAD SCORING ===\n"
+                "Classificacao: D (0-25), C (26-50), B (51-75), A (76-100)\n"
+                "Use attlas_adicionar_pontuacao(card_uuid, points, reason) automaticamente:\n"
+                "\n"
+            )
+        pts = rule.get("points", 0)
+        reason = rule.get("reason") or rule["trigger"]
+        w(f"- {rule['trigger']} -> {_format_points(pts)} (motivo: \"{reason}\")\n")
+    if has_score:
+        w("\n")
 
     # Extra
     if extra_instructions and extra_instructions.strip():
-        parts.append("=== INSTRUCOES ADICIONAIS ===")
-        parts.append(extra_instructions.strip())
-
-    return "\n".join(parts)
-
-
-def _save_tools_config(user_data: dict, new_tools_config: dict):
-    """Salva tools_config no banco e atualiza session_state."""
-    try:
-        with get_connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute(
-                    "UPDATE clients SET tools_config = %s WHERE id = %s",
-                    (json.dumps(new_tools_config), user_data["id"]),
-                )
-        user_data["tools_config"] = new_tools_config
-        st.session_state["user_data"] = user_data
-        st.success("Configuracao salva com sucesso!")
-    except Exception as e:
-        st.error(f"Erro ao salvar: {e}")
+        w("=== INSTRUCOES ADICIONAIS ===\n")
+        w(extra_instructions.strip() + "\n")
+
+    return buf.getvalue()[:-1]
+
+
+def _rules_signature(
+    qual_rules: list, score_rules: list, extra_instructions: str
+) -> tuple:
+    """Assinatura imutavel (tupla de tuplas) das regras, usada como chave de cache."""
+    return (
+        tuple(tuple(r.get(f) for f in _QUAL_FIELDS) for r in qual_rules),
+        tuple(tuple(r.get(f) for f in _SCORE_FIELDS) for r in score_rules),
+        extra_instructions,
+    )
+
+
+@st.cache_data(show_spinner=False, ttl=3600)
+def _generate_instructions_cached(sig: tuple) -> str:
+    """
+    Versao memoizada de _generate_instructions: so reconstroi o texto
+    quando a assinatura das regras muda (nao a cada rerun do Streamlit).
+    """
+    qual_sig, score_sig, extra_instructions = sig
+    qual_rules = [
+        {k: v for k, v in zip(_QUAL_FIELDS, r) if v is not None} for r in qual_sig
+    ]
+    score_rules = [
+        {k: v for k, v in zip(_SCORE_FIELDS, r) if v is not None} for r in score_sig
+    ]
+    return _generate_instructions(qual_rules, score_rules, extra_instructions)
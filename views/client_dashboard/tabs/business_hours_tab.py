@@ -5,15 +5,12 @@ Permite ao cliente definir dias e horários em que a IA responde automaticamente
 Fora do expediente, a IA fica silenciosa ou envia mensagem personalizada.
 """
 
-import json
 import streamlit as st
 
-from scripts.shared.saas_db import (
-    get_connection,
-    is_within_business_hours,
-)
+from scripts.shared.saas_db import is_within_business_hours
+from views.client_dashboard.components.config_utils import save_tools_config_many
 
-_DAY_LABELS = [
+_DAY_LABELS = (
     ("seg", "Segunda-feira"),
     ("ter", "Terça-feira"),
     ("qua", "Quarta-feira"),
@@ -21,7 +18,13 @@ _DAY_LABELS = [
     ("sex", "Sexta-feira"),
     ("sab", "Sábado"),
     ("dom", "Domingo"),
-]
+)
+
+# Chaves dos widgets de cada dia, montadas uma vez no import (não por rerun)
+_DAY_WIDGET_KEYS = {
+    day_key: (f"bh_on_{day_key}", f"bh_start_{day_key}", f"bh_end_{day_key}")
+    for day_key, _ in _DAY_LABELS
+}
 
 _DEFAULT_SCHEDULE = {
     "seg": {"on": True, "start": "08:00", "end": "18:00"},
@@ -33,8 +36,10 @@ _DEFAULT_SCHEDULE = {
     "dom": {"on": False, "start": "", "end": ""},
 }
 
-# Gera lista de horários de 00:00 a 23:30 (intervalos de 30min)
-_TIME_OPTIONS = [f"{h:02d}:{m:02d}" for h in range(24) for m in (0, 30)]
+# Gera tupla de horários de 00:00 a 23:30 (intervalos de 30min)
+_TIME_OPTIONS = tuple(f"{h:02d}:{m:02d}" for h in range(24) for m in (0, 30))
+# Índice reverso horário -> posição (lookup O(1) em vez de .index())
+_TIME_INDEX = {t: i for i, t in enumerate(_TIME_OPTIONS)}
 
 
 def render_business_hours_tab(user_data: dict):
@@ -76,6 +81,7 @@ def render_business_hours_tab(user_data: dict):
     schedule = bh.get("schedule", _DEFAULT_SCHEDULE)
     new_schedule = {}
     off_message = bh.get("off_message", "")
+    new_mode = mode  # preserva o modo salvo quando toggle está desativado
 
     if bh_active:
         st.divider()
@@ -103,80 +109,95 @@ def render_business_hours_tab(user_data: dict):
                 "A IA assumirá automaticamente fora desses horários."
             )
 
-        st.divider()
-
-        # --- Tabela de horários ---
-        # Header
-        cols = st.columns([2.5, 1, 2, 2])
-        with cols[0]:
-            st.markdown("**Dia**")
-        with cols[1]:
-            st.markdown("**Ativo**")
-        with cols[2]:
-            st.markdown("**Início**")
-        with cols[3]:
-            st.markdown("**Fim**")
-
-        for day_key, day_label in _DAY_LABELS:
-            day_cfg = schedule.get(day_key, _DEFAULT_SCHEDULE.get(day_key, {}))
+    # Tabela de horários + mensagem num st.form: 1 rerun por salvamento,
+    # não um por toggle/selectbox alterado.
+    with st.form("business_hours_form", clear_on_submit=False):
+        if bh_active:
+            st.divider()
 
+            # --- Tabela de horários ---
+            # Header
             cols = st.columns([2.5, 1, 2, 2])
             with cols[0]:
-                st.markdown(f"**{day_label}**")
+                st.markdown("**Dia**")
             with cols[1]:
-                day_on = st.toggle(
-                    day_label,
-                    value=day_cfg.get("on", False),
-                    key=f"bh_on_{day_key}",
-                    label_visibility="collapsed",
-                )
+                st.markdown("**Ativo**")
             with cols[2]:
-                start_val = day_cfg.get("start", "08:00")
-                start_idx = _TIME_OPTIONS.index(start_val) if start_val in _TIME_OPTIONS else 16
-                day_start = st.selectbox(
-                    "Início",
-                    options=_TIME_OPTIONS,
-                    index=start_idx,
-                    key=f"bh_start_{day_key}",
-                    label_visibility="collapsed",
-                    disabled=not day_on,
-                )
+                st.markdown("**Início**")
             with cols[3]:
-                end_val = day_cfg.get("end", "18:00")
-                end_idx = _TIME_OPTIONS.index(end_val) if end_val in _TIME_OPTIONS else 36
-                day_end = st.selectbox(
-                    "Fim",
-                    options=_TIME_OPTIONS,
-                    index=end_idx,
-                    key=f"bh_end_{day_key}",
-                    label_visibility="collapsed",
-                    disabled=not day_on,
-                )
-
-            new_schedule[day_key] = {
-                "on": day_on,
-                "start": day_start if day_on else day_cfg.get("start", ""),
-                "end": day_end if day_on else day_cfg.get("end", ""),
-            }
+                st.markdown("**Fim**")
+
+            for day_key, day_label in _DAY_LABELS:
+                on_key, start_key, end_key = _DAY_WIDGET_KEYS[day_key]
+                # "or" evita montar o default quando o dia já está salvo
+                day_cfg = schedule.get(day_key) or _DEFAULT_SCHEDULE[day_key]
+
+                cols = st.columns([2.5, 1, 2, 2])
+                with cols[0]:
+                    st.markdown(f"**{day_label}**")
+                with cols[1]:
+                    day_on = st.toggle(
+                        day_label,
+                        value=day_cfg.get("on", False),
+                        key=on_key,
+                        label_visibility="collapsed",
+                    )
+                # Sem disabled=not day_on: dentro do form o toggle só é
+                # aplicado no submit, e os horários travariam até salvar.
+                with cols[2]:
+                    start_val = day_cfg.get("start", "08:00")
+                    start_idx = _TIME_INDEX.get(start_val, 16)
+                    day_start = st.selectbox(
+                        "Início",
+                        options=_TIME_OPTIONS,
+                        index=start_idx,
+                        key=start_key,
+                        label_visibility="collapsed",
+                    )
+                with cols[3]:
+                    end_val = day_cfg.get("end", "18:00")
+                    end_idx = _TIME_INDEX.get(end_val, 36)
+                    day_end = st.selectbox(
+                        "Fim",
+                        options=_TIME_OPTIONS,
+                        index=end_idx,
+                        key=end_key,
+                        label_visibility="collapsed",
+                    )
 
-        st.divider()
+                if day_on:
+                    new_schedule[day_key] = {
+                        "on": True,
+                        "start": day_start,
+                        "end": day_end,
+                    }
+                else:
+                    # Dia desligado mantém os horários salvos: o fallback do
+                    # selectbox (08:00/18:00) não vaza para o banco e salvar
+                    # sem mudanças continua sendo no-op
+                    new_schedule[day_key] = {**day_cfg, "on": False}
+
+            st.divider()
+
+            # --- Mensagem fora do horário ---
+            off_message = st.text_area(
+                "Mensagem fora do horário (opcional)",
+                value=off_message,
+                height=100,
+                placeholder="Ex: Nosso horário de atendimento é de segunda a sexta, das 8h às 18h. Retornaremos em breve!",
+                help="Se preenchida, essa mensagem será enviada automaticamente quando alguém mandar mensagem fora do horário. Se vazia, a IA simplesmente não responde.",
+                key="bh_off_message",
+            )
+        else:
+            new_schedule = schedule
 
-        # --- Mensagem fora do horário ---
-        off_message = st.text_area(
-            "Mensagem fora do horário (opcional)",
-            value=off_message,
-            height=100,
-            placeholder="Ex: Nosso horário de atendimento é de segunda a sexta, das 8h às 18h. Retornaremos em breve!",
-            help="Se preenchida, essa mensagem será enviada automaticamente quando alguém mandar mensagem fora do horário. Se vazia, a IA simplesmente não responde.",
-            key="bh_off_message",
+        # --- Salvar ---
+        st.divider()
+        submitted = st.form_submit_button(
+            "Salvar Horário de Atendimento", type="primary"
         )
-    else:
-        new_schedule = schedule
-        new_mode = mode  # preserva o modo salvo quando toggle está desativado
 
-    # --- Salvar ---
-    st.divider()
-    if st.button("Salvar Horário de Atendimento", type="primary"):
+    if submitted:
         new_bh = {
             "active": bh_active,
             "mode": new_mode,
@@ -184,19 +205,9 @@ def render_business_hours_tab(user_data: dict):
             "off_message": off_message,
         }
 
-        try:
-            new_tools_config = t_config.copy()
-            new_tools_config["business_hours"] = new_bh
-
-            with get_connection() as conn:
-                with conn.cursor() as cur:
-                    cur.execute(
-                        "UPDATE clients SET tools_config = %s WHERE id = %s",
-                        (json.dumps(new_tools_config), user_data["id"]),
-                    )
-
-            user_data["tools_config"] = new_tools_config
-            st.session_state["user_data"] = user_data
-            st.success("Horário de atendimento salvo com sucesso!")
-        except Exception as e:
-            st.error(f"Erro ao salvar: {e}")
+        save_tools_config_many(
+            user_data,
+            {"business_hours": new_bh},
+            success_msg="Horário de atendimento salvo com sucesso!",
+            unchanged_msg="Nada a salvar: horário de atendimento inalterado.",
+        )
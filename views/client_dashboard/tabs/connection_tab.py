@@ -1,8 +1,30 @@
 import streamlit as st
-import asyncio
+import logging
 import os
 
-from scripts.shared.saas_db import get_provider_config, upsert_provider_config
+from scripts.shared.saas_db import get_provider_config
+from scripts.uazapi.uazapi_saas import (
+    get_instance_status,
+    connect_instance,
+    disconnect_instance,
+)
+from views.client_dashboard.components.config_utils import save_provider_config
+from views.client_dashboard.components.async_loop import (
+    run_async,
+    run_async_with_timeout,
+)
+
+logger = logging.getLogger(__name__)
+
+
+@st.cache_data(ttl=5, show_spinner=False)
+def _cached_instance_status(api_key, api_url):
+    """
+    Status da instância com TTL curto: reruns causados por outros widgets
+    não repetem o round-trip HTTP. "Atualizar Status" limpa só a entrada
+    desta instância (os demais clientes mantêm o cache).
+    """
+    return run_async(get_instance_status(api_key=api_key, base_url=api_url))
 
 
 def render_connection_tab(user_data):
@@ -11,27 +33,6 @@ def render_connection_tab(user_data):
         "Conecte via QR Code (Z-API/Evolution) se preferir não usar a API Oficial."
     )
 
-    # Lazy import to avoid circular dependency
-    try:
-        from scripts.uazapi.uazapi_saas import (
-            get_instance_status,
-            connect_instance,
-            disconnect_instance,
-        )
-    except ImportError:
-        import sys
-
-        # Calculate root_dir for fallback import
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        root_dir = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
-        sys.path.append(root_dir)
-
-        from scripts.uazapi.uazapi_saas import (
-            get_instance_status,
-            connect_instance,
-            disconnect_instance,
-        )
-
     # Buscar de client_providers (novo) com fallback para colunas (legado)
     uazapi_cfg = get_provider_config(str(user_data["id"]), "uazapi") or {}
     if not uazapi_cfg:
@@ -66,9 +67,9 @@ def render_connection_tab(user_data):
             if st.form_submit_button("💾 Salvar Configuração"):
                 try:
                     # Salvar em client_providers (novo)
-                    upsert_provider_config(
-                        client_id=str(user_data["id"]),
-                        provider_type="uazapi",
+                    save_provider_config(
+                        str(user_data["id"]),
+                        "uazapi",
                         config={"url": new_url, "token": new_key},
                         is_active=True,
                         is_default=(
@@ -95,9 +96,9 @@ def render_connection_tab(user_data):
 
                 if st.form_submit_button("💾 Atualizar Credenciais"):
                     try:
-                        upsert_provider_config(
-                            client_id=str(user_data["id"]),
-                            provider_type="uazapi",
+                        save_provider_config(
+                            str(user_data["id"]),
+                            "uazapi",
                             config={"url": edit_url, "token": edit_key},
                             is_active=True,
                             is_default=True,
@@ -111,13 +112,12 @@ def render_connection_tab(user_data):
         col1, col2 = st.columns([1, 3])
         with col1:
             if st.button("🔄 Atualizar Status"):
+                _cached_instance_status.clear(api_key, api_url)
                 st.rerun()
 
         status_data = {}
         try:
-            status_data = asyncio.run(
-                get_instance_status(api_key=api_key, base_url=api_url)
-            )
+            status_data = _cached_instance_status(api_key, api_url)
         except Exception as e:
             st.error(f"Erro ao conectar na API Uazapi: {e}")
             st.caption(f"URL: {api_url}")
@@ -154,7 +154,7 @@ def render_connection_tab(user_data):
             if st.button("🔗 Gerar QR Code / Conectar"):
                 with st.spinner("Solicitando conexão..."):
                     try:
-                        resp = asyncio.run(
+                        resp = run_async(
                             connect_instance(
                                 phone=phone_num if phone_num else None,
                                 api_key=api_key,
@@ -194,9 +194,21 @@ def render_connection_tab(user_data):
         if state == "open" or state == "connecting":
             st.divider()
             if st.button("🚪 Desconectar", type="primary"):
-                try:
-                    asyncio.run(disconnect_instance(api_key=api_key, base_url=api_url))
-                    st.success("Comando de logout enviado.")
+                # Espera a API (até 5s) antes do rerun: sem isso o status
+                # recarregado ainda vinha "conectado"
+                with st.spinner("Desconectando..."):
+                    resp = run_async_with_timeout(
+                        disconnect_instance(api_key=api_key, base_url=api_url),
+                        "disconnect_instance",
+                        timeout=5,
+                    )
+                if isinstance(resp, dict) and resp.get("error"):
+                    st.error(f"Erro ao desconectar: {resp['error']}")
+                else:
+                    _cached_instance_status.clear(api_key, api_url)
+                    st.toast(
+                        "Instância desconectada."
+                        if resp is not None
+                        else "Desconectando... o status pode levar alguns segundos."
+                    )
                     st.rerun()
-                except Exception as e:
-                    st.error(f"Erro ao desconectar: {e}")
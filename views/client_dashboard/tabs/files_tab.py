@@ -1,17 +1,26 @@
 import streamlit as st
 import os
-import uuid
-import sys
-
-# Ensure root dir is in path for imports
-current_dir = os.path.dirname(os.path.abspath(__file__))
-root_dir = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
-if root_dir not in sys.path:
-    sys.path.insert(0, root_dir)
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import shutil
+import tempfile
 
+# sys.path da raiz e ajustado uma vez em views/__init__.py
 from scripts.shared.saas_db import get_connection
 
 
+@st.cache_data(ttl=30, show_spinner=False)
+def _cached_list_files(_gemini_manager, store_id):
+    """
+    Lista (name, display_name) dos documentos do store, em cache por 30s.
+    _gemini_manager não entra na chave (prefixo _); limpar após upload/delete.
+    Erros propagam: st.cache_data não guarda exceções, só listas válidas.
+    """
+    return [
+        (f.name, f.display_name or f.name)
+        for f in _gemini_manager.list_files_in_store(store_id, raise_errors=True)
+    ]
+
+
 def render_files_tab(user_data, gemini_manager):
     st.header("Gerenciar Conhecimento")
     c_store_id = user_data.get("store_id")
@@ -53,47 +62,83 @@ def render_files_tab(user_data, gemini_manager):
         if st.button("📤 Enviar para IA"):
             if uploaded_files:
                 bar = st.progress(0)
-                for i, file in enumerate(uploaded_files):
-                    # Save temp with SAFE ASCII NAME using UUID
-                    ext = os.path.splitext(file.name)[1]
-                    tpath = f"temp_{uuid.uuid4().hex}{ext}"
+                st.write(f"Enviando {len(uploaded_files)} arquivo(s)...")
 
-                    with open(tpath, "wb") as f:
-                        f.write(file.getbuffer())
+                def _upload_one(file):
+                    """Roda numa thread do pool: sem chamadas st.* aqui."""
+                    # Temp no diretório temporário do SO (geralmente tmpfs), nome
+                    # ASCII aleatório; a extensão é mantida para detectar o MIME
+                    ext = os.path.splitext(file.name)[1]
 
-                    st.write(f"Enviando {file.name}...")
-                    # Upload usando Manager
-                    op, err = gemini_manager.upload_file_to_store(
-                        tpath, c_store_id, custom_display_name=file.name
+                    tf = tempfile.NamedTemporaryFile(
+                        prefix="temp_", suffix=ext, delete=False
                     )
+                    tpath = tf.name
+                    # finally cobre escrita + upload: o temp nunca fica para trás
+                    try:
+                        # Copia em blocos de 1MB: não duplica o arquivo inteiro em memória
+                        with tf:
+                            file.seek(0)
+                            shutil.copyfileobj(file, tf, length=1024 * 1024)
 
-                    if op:
-                        st.success(f"✅ {file.name} ok!")
-                    else:
-                        st.error(f"Erro {file.name}: {err}")
+                        # Upload usando Manager
+                        op, err = gemini_manager.upload_file_to_store(
+                            tpath, c_store_id, custom_display_name=file.name
+                        )
+                        return file.name, bool(op), err
+                    except Exception as e:
+                        # Falha de um arquivo não derruba o lote inteiro
+                        return file.name, False, str(e)
+                    finally:
+                        if os.path.exists(tpath):
+                            os.unlink(tpath)
 
-                    if os.path.exists(tpath):
-                        os.remove(tpath)
-                    bar.progress((i + 1) / len(uploaded_files))
+                # Uploads em paralelo (gargalo é rede/indexação no Gemini, não CPU).
+                # Os resultados são consumidos nesta thread, então o contador
+                # do progresso não precisa de lock.
+                total = len(uploaded_files)
+                # No máximo ~20 redesenhos da barra, independente do tamanho do lote
+                step = max(1, total // 20)
+                with ThreadPoolExecutor(max_workers=min(8, total)) as pool:
+                    futures = [pool.submit(_upload_one, f) for f in uploaded_files]
+                    for done, fut in enumerate(as_completed(futures), 1):
+                        name, ok, err = fut.result()
+                        if ok:
+                            st.success(f"✅ {name} ok!")
+                        else:
+                            st.error(f"Erro {name}: {err}")
+                        if done % step == 0 or done == total:
+                            bar.progress(done / total)
+                # Listagem abaixo precisa refletir os novos arquivos (só desta store)
+                _cached_list_files.clear(gemini_manager, c_store_id)
 
         st.divider()
 
         # LISTAGEM
         st.subheader("Arquivos Ativos")
         try:
-            files = gemini_manager.list_files_in_store(c_store_id)
-            found = False
-            for f in files:
-                found = True
-                c1, c2 = st.columns([4, 1])
-                with c1:
-                    dname = f.display_name if f.display_name else f.name
-                    st.text(f"📄 {dname}")
-                with c2:
-                    if st.button("🗑️", key=f"del_{f.name}"):
-                        gemini_manager.delete_file(f.name)
-                        st.rerun()
-            if not found:
+            files = _cached_list_files(gemini_manager, c_store_id)
+            # Marca os arquivos e exclui todos de uma vez (um único rerun)
+            selected = [
+                fname
+                for fname, dname in files
+                if st.checkbox(f"📄 {dname}", key=f"sel_{fname}")
+            ]
+            if not files:
                 st.info("Nenhum arquivo na base.")
+            elif st.button(
+                f"🗑️ Excluir selecionados ({len(selected)})", disabled=not selected
+            ):
+                with st.spinner(f"Excluindo {len(selected)} arquivo(s)..."):
+                    with ThreadPoolExecutor(max_workers=min(8, len(selected))) as pool:
+                        results = list(pool.map(gemini_manager.delete_file, selected))
+                _cached_list_files.clear(gemini_manager, c_store_id)
+                for fname in selected:
+                    st.session_state.pop(f"sel_{fname}", None)
+                failed = results.count(False)
+                if failed:
+                    st.error(f"{failed} arquivo(s) não puderam ser excluídos.")
+                else:
+                    st.rerun()
         except Exception as e:
             st.error(f"Erro ao listar arquivos: {e}")
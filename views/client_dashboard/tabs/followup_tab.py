@@ -1,21 +1,16 @@
-import json
-import copy
 import streamlit as st
-import os
-import sys
-
-# Ensure root dir is in path for imports
-current_dir = os.path.dirname(os.path.abspath(__file__))
-root_dir = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
-if root_dir not in sys.path:
-    sys.path.insert(0, root_dir)
+import uuid
 
+# sys.path da raiz e ajustado uma vez em views/__init__.py
+from psycopg.types.json import Jsonb
 from scripts.shared.saas_db import get_connection, is_within_followup_hours
 
-# Gera lista de horarios de 00:00 a 23:30 (intervalos de 30min)
-_TIME_OPTIONS = [f"{h:02d}:{m:02d}" for h in range(24) for m in (0, 30)]
+# Gera tupla de horarios de 00:00 a 23:30 (intervalos de 30min)
+_TIME_OPTIONS = tuple(f"{h:02d}:{m:02d}" for h in range(24) for m in (0, 30))
+# Indice reverso horario -> posicao (lookup O(1) em vez de .index())
+_TIME_INDEX = {t: i for i, t in enumerate(_TIME_OPTIONS)}
 
-_DAY_LABELS = [
+_DAY_LABELS = (
     ("seg", "Seg"),
     ("ter", "Ter"),
     ("qua", "Qua"),
@@ -23,7 +18,7 @@ _DAY_LABELS = [
     ("sex", "Sex"),
     ("sab", "Sab"),
     ("dom", "Dom"),
-]
+)
 
 _DEFAULT_DAYS = {
     "seg": True,
@@ -36,6 +31,19 @@ _DEFAULT_DAYS = {
 }
 
 
+@st.cache_data(ttl=30, show_spinner=False)
+def _can_fire(start: str, end: str, days_tuple: tuple) -> bool:
+    """Status ao vivo da faixa permitida, recalculado no máximo a cada 30s."""
+    return is_within_followup_hours(
+        {"allowed_hours": {
+            "enabled": True,
+            "start": start,
+            "end": end,
+            "days": dict(days_tuple),
+        }}
+    )
+
+
 def render_followup_tab(user_data):
     st.header("Follow-up Automatico")
     st.info(
@@ -52,7 +60,11 @@ def render_followup_tab(user_data):
 
     # Inicializacao Robusta (Separada)
     if stages_key not in st.session_state:
-        st.session_state[stages_key] = copy.deepcopy(f_config.get("stages", []))
+        # Copia rasa por etapa basta: só as chaves de topo são reatribuídas.
+        # _id estável identifica os widgets da etapa (removido antes de salvar)
+        st.session_state[stages_key] = [
+            {**s, "_id": uuid.uuid4().hex} for s in f_config.get("stages", [])
+        ]
 
     if active_key not in st.session_state:
         st.session_state[active_key] = f_config.get("active", False)
@@ -78,13 +90,10 @@ def render_followup_tab(user_data):
 
         if ah_enabled:
             # Status atual em tempo real
-            can_fire = is_within_followup_hours(
-                {"allowed_hours": {
-                    "enabled": True,
-                    "start": allowed_hours.get("start", "08:00"),
-                    "end": allowed_hours.get("end", "20:00"),
-                    "days": allowed_hours.get("days", _DEFAULT_DAYS),
-                }}
+            can_fire = _can_fire(
+                allowed_hours.get("start", "08:00"),
+                allowed_hours.get("end", "20:00"),
+                tuple(sorted(allowed_hours.get("days", _DEFAULT_DAYS).items())),
             )
             if can_fire:
                 st.success("Status: Dentro da faixa permitida — follow-ups podem disparar agora.")
@@ -95,7 +104,7 @@ def render_followup_tab(user_data):
             col_start, col_end = st.columns(2)
             with col_start:
                 start_val = allowed_hours.get("start", "08:00")
-                start_idx = _TIME_OPTIONS.index(start_val) if start_val in _TIME_OPTIONS else 16
+                start_idx = _TIME_INDEX.get(start_val, 16)
                 ah_start = st.selectbox(
                     "Horario de Inicio",
                     options=_TIME_OPTIONS,
@@ -104,7 +113,7 @@ def render_followup_tab(user_data):
                 )
             with col_end:
                 end_val = allowed_hours.get("end", "20:00")
-                end_idx = _TIME_OPTIONS.index(end_val) if end_val in _TIME_OPTIONS else 40
+                end_idx = _TIME_INDEX.get(end_val, 40)
                 ah_end = st.selectbox(
                     "Horario de Fim",
                     options=_TIME_OPTIONS,
@@ -146,15 +155,16 @@ def render_followup_tab(user_data):
 
     st.subheader(f"Etapas de Retomada ({len(current_stages)})")
 
-    indices_to_remove = []
+    ids_to_remove = set()
     for i, stage in enumerate(current_stages):
+        sid = stage["_id"]
         with st.expander(f"Etapa {i + 1}", expanded=True):
             c1, c2 = st.columns([2, 1])
             stage_type = c1.selectbox(
                 "Tipo de Mensagem",
                 ["Texto (IA)", "Audio Gravado"],
                 index=0 if stage.get("type", "text") == "text" else 1,
-                key=f"t_{user_data['id']}_{i}",
+                key=f"t_{user_data['id']}_{sid}",
             )
             stage["type"] = "audio" if stage_type == "Audio Gravado" else "text"
 
@@ -162,7 +172,7 @@ def render_followup_tab(user_data):
                 "Esperar (minutos)",
                 min_value=0,
                 value=int(stage.get("delay_minutes", 60)),
-                key=f"d_{user_data['id']}_{i}",
+                key=f"d_{user_data['id']}_{sid}",
                 help="0 = Enviar junto com a mensagem anterior (Cadeia).",
             )
 
@@ -170,7 +180,7 @@ def render_followup_tab(user_data):
                 stage["prompt"] = st.text_area(
                     "Instrucao para IA",
                     value=stage.get("prompt", "Pergunte se precisa de ajuda."),
-                    key=f"p_{user_data['id']}_{i}",
+                    key=f"p_{user_data['id']}_{sid}",
                 )
                 stage["audio_url"] = None
             else:
@@ -178,22 +188,25 @@ def render_followup_tab(user_data):
                     "URL do Audio (MP3/OGG)",
                     value=stage.get("audio_url", ""),
                     placeholder="https://exemplo.com/audio.mp3",
-                    key=f"a_{user_data['id']}_{i}",
+                    key=f"a_{user_data['id']}_{sid}",
                     help="Link direto para o arquivo de audio. Deve ser publico.",
                 )
                 stage["prompt"] = None
 
-            if st.button("Remover Etapa", key=f"rem_{user_data['id']}_{i}"):
-                indices_to_remove.append(i)
+            if st.button("Remover Etapa", key=f"rem_{user_data['id']}_{sid}"):
+                ids_to_remove.add(sid)
 
-    if indices_to_remove:
-        for index in sorted(indices_to_remove, reverse=True):
-            del st.session_state[stages_key][index]
+    if ids_to_remove:
+        # Keys por _id: as etapas restantes mantêm seus widgets intactos
+        st.session_state[stages_key] = [
+            s for s in current_stages if s["_id"] not in ids_to_remove
+        ]
         st.rerun()
 
     if st.button("Adicionar Nova Etapa"):
         st.session_state[stages_key].append(
             {
+                "_id": uuid.uuid4().hex,
                 "delay_minutes": 60,
                 "prompt": "Pergunte educadamente se ficou alguma duvida pendente.",
             }
@@ -207,7 +220,10 @@ def render_followup_tab(user_data):
     if st.button("Salvar Configuracao de Follow-up", type="primary"):
         final_config = {
             "active": active,
-            "stages": st.session_state[stages_key],
+            "stages": [
+                {k: v for k, v in s.items() if k != "_id"}
+                for s in st.session_state[stages_key]
+            ],
             "allowed_hours": {
                 "enabled": ah_enabled,
                 "start": ah_start,
@@ -215,15 +231,24 @@ def render_followup_tab(user_data):
                 "days": new_days,
             },
         }
-        try:
-            with get_connection() as conn:
-                with conn.cursor() as cur:
-                    cur.execute(
-                        "UPDATE clients SET followup_config = %s WHERE id = %s",
-                        (json.dumps(final_config), user_data["id"]),
-                    )
-            user_data["followup_config"] = final_config
-            st.success("Configuracao salva com sucesso!")
-            st.rerun()
-        except Exception as e:
-            st.error(f"Erro ao salvar: {e}")
+        # Clique em Salvar sem alterar nada: evita o UPDATE
+        if final_config == (user_data.get("followup_config") or {}):
+            st.info("Nada a salvar: configuracao inalterada.")
+        else:
+            try:
+                with get_connection() as conn:
+                    with conn.cursor() as cur:
+                        # Jsonb: envia o dict adaptado direto (sem json.dumps + parse de texto)
+                        # RETURNING: estado gravado volta no mesmo round-trip
+                        cur.execute(
+                            "UPDATE clients SET followup_config = %s WHERE id = %s "
+                            "RETURNING followup_config",
+                            (Jsonb(final_config), user_data["id"]),
+                            prepare=True,
+                        )
+                        row = cur.fetchone()
+                user_data["followup_config"] = row["followup_config"] if row else final_config
+                st.success("Configuracao salva com sucesso!")
+                st.rerun()
+            except Exception as e:
+                st.error(f"Erro ao salvar: {e}")
@@ -5,21 +5,43 @@ Permite ao cliente escolher provider (OpenAI / OpenRouter), modelo, temperature,
 e opcionalmente fornecer sua própria API key.
 """
 
-import json
 import streamlit as st
 
-from scripts.shared.saas_db import get_connection
 from scripts.shared.llm_provider import (
     MODEL_CATALOG,
     PROVIDER_OPTIONS,
 )
 from scripts.shared.crypto_utils import encrypt
+from views.client_dashboard.components.config_utils import save_tools_config_many
 
 # Defaults
 _DEFAULT_PROVIDER = "openai"
 _DEFAULT_MODEL = "gpt-4o-mini"
 _DEFAULT_TEMPERATURE = 0.5
 
+# Mapas reversos do PROVIDER_OPTIONS, montados uma vez no import
+_PROVIDER_KEYS = list(PROVIDER_OPTIONS.keys())
+_PROVIDER_LABELS = list(PROVIDER_OPTIONS.values())
+_PROVIDER_INDEX = {k: i for i, k in enumerate(_PROVIDER_KEYS)}
+_LABEL_TO_PROVIDER = {v: k for k, v in PROVIDER_OPTIONS.items()}
+
+
+@st.cache_data(show_spinner=False)
+def _model_lists(provider: str):
+    """
+    Retorna (ids, labels, id_default, label->id) dos modelos do provider
+    (catálogo estático).
+    """
+    models = MODEL_CATALOG.get(provider, [])
+    ids = tuple(m["id"] for m in models)
+    labels = tuple(m["label"] for m in models)
+    return (
+        ids,
+        labels,
+        next((m["id"] for m in models if m.get("default")), None),
+        dict(zip(labels, ids)),
+    )
+
 
 def render_llm_config_tab(user_data: dict):
     st.header("Modelo de IA")
@@ -46,17 +68,11 @@ def render_llm_config_tab(user_data: dict):
     st.divider()
 
     # --- Provider ---
-    provider_keys = list(PROVIDER_OPTIONS.keys())
-    provider_labels = list(PROVIDER_OPTIONS.values())
-    current_provider_idx = (
-        provider_keys.index(current_provider)
-        if current_provider in provider_keys
-        else 0
-    )
+    current_provider_idx = _PROVIDER_INDEX.get(current_provider, 0)
 
     selected_provider_label = st.selectbox(
         "Provider",
-        options=provider_labels,
+        options=_PROVIDER_LABELS,
         index=current_provider_idx,
         help=(
             "**OpenAI (Direto)**: Conexão direta com a API da OpenAI. "
@@ -66,20 +82,19 @@ def render_llm_config_tab(user_data: dict):
         ),
         key="llm_provider",
     )
-    selected_provider = provider_keys[provider_labels.index(selected_provider_label)]
+    selected_provider = _LABEL_TO_PROVIDER[selected_provider_label]
 
     # --- Modelo ---
-    models = MODEL_CATALOG.get(selected_provider, [])
-    model_ids = [m["id"] for m in models]
-    model_labels = [m["label"] for m in models]
+    model_ids, model_labels, default_model, label_to_id = _model_lists(
+        selected_provider
+    )
 
     # Tenta manter o modelo atual selecionado
     if current_model in model_ids:
         current_model_idx = model_ids.index(current_model)
     else:
         # Pega o default do provider
-        default_models = [m for m in models if m.get("default")]
-        current_model_idx = model_ids.index(default_models[0]["id"]) if default_models else 0
+        current_model_idx = model_ids.index(default_model) if default_model else 0
 
     selected_model_label = st.selectbox(
         "Modelo",
@@ -88,7 +103,7 @@ def render_llm_config_tab(user_data: dict):
         help="Cada modelo tem diferentes capacidades, velocidade e custo.",
         key="llm_model",
     )
-    selected_model = model_ids[model_labels.index(selected_model_label)]
+    selected_model = label_to_id[selected_model_label]
 
     # --- Temperature ---
     selected_temperature = st.slider(
@@ -156,21 +171,10 @@ def render_llm_config_tab(user_data: dict):
         if final_key:
             new_llm_config["api_key"] = encrypt(final_key)
 
-        try:
-            new_tools_config = t_config.copy()
-            new_tools_config["llm_config"] = new_llm_config
-
-            with get_connection() as conn:
-                with conn.cursor() as cur:
-                    cur.execute(
-                        "UPDATE clients SET tools_config = %s WHERE id = %s",
-                        (json.dumps(new_tools_config), user_data["id"]),
-                    )
-
-            user_data["tools_config"] = new_tools_config
-            st.session_state["user_data"] = user_data
-            st.success(
-                f"Modelo atualizado para **{selected_model}** via **{selected_provider_label}**!"
-            )
-        except Exception as e:
-            st.error(f"Erro ao salvar: {e}")
+        # Clique em Salvar sem alterar nada: o helper detecta e evita o UPDATE
+        save_tools_config_many(
+            user_data,
+            {"llm_config": new_llm_config},
+            success_msg=f"Modelo atualizado para **{selected_model}** via **{selected_provider_label}**!",
+            unchanged_msg="Nada a salvar: configuração do modelo inalterada.",
+        )
@@ -1,8 +1,89 @@
 import streamlit as st
-import pandas as pd
-from datetime import datetime
 from scripts.shared.saas_db import get_connection
 
+_REMINDERS_SQL = """
+    SELECT id, chat_id, scheduled_at, message, status
+    FROM reminders
+    WHERE client_id = %s AND status = 'pending'
+    ORDER BY scheduled_at ASC
+"""
+
+_ACTIVE_CONVERSATIONS_SQL = """
+    SELECT chat_id, status, followup_stage, last_message_at, last_role
+    FROM active_conversations
+    WHERE client_id = %s AND status = 'active'
+    ORDER BY last_message_at DESC
+"""
+# Mesma ordem do SELECT acima (ordem fixa das colunas na tabela)
+_ACTIVE_CONVERSATIONS_COLUMNS = (
+    "chat_id",
+    "status",
+    "followup_stage",
+    "last_message_at",
+    "last_role",
+)
+
+
+def _fetch_live_rows(client_id, cancel_ids=None):
+    """
+    Busca lembretes pendentes e conversas ativas numa única conexão.
+    Pipeline: as queries vão juntas ao servidor (1 round-trip em vez de 2-3).
+    Se cancel_ids for passado, o cancelamento (em lote) vai antes do SELECT
+    (a lista já volta sem os lembretes). Retorna (lembretes, conversas, n_cancelados).
+    """
+    # prepare=True: SQL fixo, só muda o client_id; o plano fica preparado na
+    # conexão do pool e é reaproveitado nos próximos reruns
+    with get_connection() as conn:
+        with conn.pipeline():
+            cancel_cur = None
+            if cancel_ids:
+                # RETURNING confirma quais lembretes existiam (e eram deste cliente)
+                cancel_cur = conn.execute(
+                    "UPDATE reminders SET status = 'cancelled' "
+                    "WHERE id = ANY(%s::uuid[]) AND client_id = %s "
+                    "AND status = 'pending' RETURNING id",
+                    (list(cancel_ids), client_id),
+                    prepare=True,
+                )
+            rem_cur = conn.execute(_REMINDERS_SQL, (client_id,), prepare=True)
+            conv_cur = conn.execute(
+                _ACTIVE_CONVERSATIONS_SQL, (client_id,), prepare=True
+            )
+        cancelled = len(cancel_cur.fetchall()) if cancel_cur is not None else 0
+        return rem_cur.fetchall(), conv_cur.fetchall(), cancelled
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _cached_error_logs():
+    """
+    Últimos 50 erros (iguais para todas as sessões); cache de 60s.
+    Só colunas leves: traceback/context_data vêm sob demanda (_error_log_details).
+    """
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT id, timestamp, source, error_type, message, client_id, chat_id
+                FROM error_logs
+                ORDER BY timestamp DESC
+                LIMIT 50
+                """,
+                prepare=True,
+            )
+            return cur.fetchall()
+
+
+@st.cache_data(max_entries=100, show_spinner=False)
+def _error_log_details(err_id):
+    """Colunas pesadas de um único log (registro imutável: cache sem TTL)."""
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT traceback, context_data, memory_usage FROM error_logs WHERE id = %s",
+                (err_id,),
+            )
+            return cur.fetchone() or {}
+
 
 def render_monitoring_tab(user_data):
     st.header("📊 Monitoramento em Tempo Real")
@@ -14,143 +95,151 @@ def render_monitoring_tab(user_data):
     with tab1:
         st.subheader("Lembretes Pendentes")
 
-        # Action: Cancel Reminder
-        if "cancel_reminder" in st.session_state:
-            r_id = st.session_state.pop("cancel_reminder")
-            try:
-                with get_connection() as conn:
-                    with conn.cursor() as cur:
-                        cur.execute(
-                            "UPDATE reminders SET status = 'cancelled' WHERE id = %s AND client_id = %s",
-                            (r_id, user_data["id"]),
-                        )
-                st.success(f"Lembrete {r_id} cancelado!")
-            except Exception as e:
-                st.error(f"Erro ao cancelar: {e}")
+        # Action: Cancel Reminders (vai junto com a busca abaixo)
+        cancel_ids = st.session_state.pop("cancel_reminders", None)
 
-        # Query Reminders
+        # Lembretes e conversas ativas (tab2) chegam juntos
+        rows = conv_rows = live_error = None
         try:
-            with get_connection() as conn:
-                with conn.cursor() as cur:
-                    cur.execute(
-                        """
-                        SELECT id, chat_id, scheduled_at, message, status 
-                        FROM reminders 
-                        WHERE client_id = %s AND status = 'pending'
-                        ORDER BY scheduled_at ASC
-                    """,
-                        (user_data["id"],),
+            rows, conv_rows, cancelled = _fetch_live_rows(user_data["id"], cancel_ids)
+            if cancel_ids:
+                if cancelled == len(cancel_ids):
+                    st.success(f"{cancelled} lembrete(s) cancelado(s)!")
+                else:
+                    st.warning(
+                        f"{cancelled} de {len(cancel_ids)} lembrete(s) cancelado(s); "
+                        "os demais não foram encontrados."
                     )
-                    rows = cur.fetchall()
-
-            if rows:
-                df = pd.DataFrame(rows)
-                # Format Date
-                df["scheduled_at"] = pd.to_datetime(df["scheduled_at"]).dt.strftime(
-                    "%d/%m/%Y %H:%M"
-                )
-
-                # Display as detailed cards or table
-                for index, row in df.iterrows():
-                    with st.expander(f"📅 {row['scheduled_at']} - {row['chat_id']}"):
-                        st.write(f"**Mensagem:** {row['message']}")
-                        st.write(f"**Status:** {row['status']}")
-                        if st.button(
-                            "❌ Cancelar Lembrete", key=f"btn_cancel_{row['id']}"
-                        ):
-                            st.session_state["cancel_reminder"] = row["id"]
-                            st.rerun()
-            else:
-                st.info("Nenhum lembrete pendente.")
-
         except Exception as e:
-            st.warning(f"Erro ao buscar lembretes (Tabela existe?): {e}")
+            live_error = e
+            if cancel_ids:
+                st.error(f"Erro ao cancelar: {e}")
+
+        if live_error:
+            st.warning(f"Erro ao buscar lembretes (Tabela existe?): {live_error}")
+        elif rows:
+            # Uma única tabela editável (coluna de checkbox) em vez de um
+            # expander + botão por lembrete
+            records = [
+                {
+                    "cancelar": False,
+                    "scheduled_at": (
+                        row["scheduled_at"].strftime("%d/%m/%Y %H:%M")
+                        if row["scheduled_at"]
+                        else "-"
+                    ),
+                    "chat_id": row["chat_id"],
+                    "message": row["message"],
+                    "status": row["status"],
+                    "id": str(row["id"]),  # UUID -> str (Arrow não serializa UUID)
+                }
+                for row in rows
+            ]
+            # Key derivada dos ids: se a lista mudar entre reruns (lembrete
+            # enviado/novo), as marcações (guardadas por índice) são descartadas
+            shown_ids = tuple(r["id"] for r in records)
+            editor_key = f"reminders_editor_{hash(shown_ids)}"
+            edited = st.data_editor(
+                records,
+                column_config={
+                    "cancelar": st.column_config.CheckboxColumn("Cancelar"),
+                    "scheduled_at": "Agendado para",
+                    "chat_id": "Chat",
+                    "message": st.column_config.TextColumn("Mensagem", width="large"),
+                    "status": "Status",
+                    "id": None,  # oculta
+                },
+                disabled=["scheduled_at", "chat_id", "message", "status"],
+                hide_index=True,
+                width="stretch",
+                key=editor_key,
+            )
+            shown = set(shown_ids)
+            selected = [r["id"] for r in edited if r["cancelar"] and r["id"] in shown]
+            if st.button(
+                f"❌ Cancelar selecionados ({len(selected)})", disabled=not selected
+            ):
+                st.session_state["cancel_reminders"] = selected
+                # Zera as marcações: a tabela volta sem os cancelados
+                st.session_state.pop(editor_key, None)
+                st.rerun()
+        else:
+            st.info("Nenhum lembrete pendente.")
 
     # --- TAB 2: ACTIVE FOLLOW-UPS ---
     with tab2:
         st.subheader("Conversas em Acompanhamento")
 
-        try:
-            with get_connection() as conn:
-                with conn.cursor() as cur:
-                    cur.execute(
-                        """
-                        SELECT chat_id, status, followup_stage, last_message_at, last_role
-                        FROM active_conversations
-                        WHERE client_id = %s AND status = 'active'
-                        ORDER BY last_message_at DESC
-                    """,
-                        (user_data["id"],),
-                    )
-                    rows = cur.fetchall()
-
-            if rows:
-                df = pd.DataFrame(rows)
-                st.dataframe(
-                    df,
-                    column_config={
-                        "last_message_at": st.column_config.DatetimeColumn(
-                            "Última Msg", format="DD/MM/YYYY HH:mm"
-                        ),
-                        "followup_stage": "Estágio",
-                    },
-                    width="stretch",
-                )
-            else:
-                st.info("Nenhuma conversa ativa no momento.")
-
-        except Exception as e:
-            st.error(f"Erro ao buscar conversas: {e}")
+        if live_error:
+            st.error(f"Erro ao buscar conversas: {live_error}")
+        elif conv_rows:
+            # Lista de dicts direto: o Streamlit converte para Arrow sem pandas
+            st.dataframe(
+                conv_rows,
+                column_order=_ACTIVE_CONVERSATIONS_COLUMNS,
+                column_config={
+                    "last_message_at": st.column_config.DatetimeColumn(
+                        "Última Msg", format="DD/MM/YYYY HH:mm"
+                    ),
+                    "followup_stage": "Estágio",
+                },
+                width="stretch",
+            )
+        else:
+            st.info("Nenhuma conversa ativa no momento.")
 
     # --- TAB 3: ERROR LOGS (NEW) ---
     with tab3:
-        st.subheader("🐞 Logs de Erro (Sistema)")
-        st.caption(
-            "Visualize erros recentes para debug. Mostrando últimos 50 registros."
-        )
-
-        if st.button("🔄 Atualizar Logs"):
-            st.rerun()
-
-        try:
-            with get_connection() as conn:
-                with conn.cursor() as cur:
-                    # Tenta criar se não existir (garantia visual)
-                    # Mas o backend já cria.
-                    cur.execute(
-                        """
-                        SELECT id, timestamp, source, error_type, message, traceback, client_id, chat_id, memory_usage, context_data
-                        FROM error_logs
-                        ORDER BY timestamp DESC
-                        LIMIT 50
-                        """
-                    )
-                    error_rows = cur.fetchall()
-
-            if error_rows:
-                for err in error_rows:
-                    ts = err["timestamp"].strftime("%d/%m %H:%M:%S")
-                    label = f"🚨 [{ts}] {err['source']} - {err['error_type']}"
-
-                    with st.expander(label):
-                        st.error(f"**Mensagem:** {err['message']}")
-
-                        c1, c2, c3 = st.columns(3)
-                        c1.metric("Client ID", err["client_id"] or "N/A")
-                        c2.metric("Chat ID", err["chat_id"] or "N/A")
-                        c3.metric("Memória", err["memory_usage"] or "N/A")
-
-                        st.text_area("Traceback", err["traceback"], height=200)
-
-                        if err["context_data"]:
-                            st.json(err["context_data"])
-            else:
-                st.success("🎉 Nenhum erro registrado recentemente!")
+        _render_error_logs()
+
+
+@st.fragment
+def _render_error_logs():
+    """
+    Aba de logs como fragment: Atualizar / Ver detalhes reexecutam só este
+    bloco, sem refazer a busca de lembretes e conversas das outras abas.
+    """
+    st.subheader("🐞 Logs de Erro (Sistema)")
+    st.caption(
+        "Visualize erros recentes para debug. Mostrando últimos 50 registros."
+    )
+
+    # O clique já reexecuta o fragment; limpar o cache faz a busca abaixo ir ao banco
+    if st.button("🔄 Atualizar Logs"):
+        _cached_error_logs.clear()
+
+    try:
+        error_rows = _cached_error_logs()
+
+        if error_rows:
+            for err in error_rows:
+                ts = err["timestamp"].strftime("%d/%m %H:%M:%S")
+                label = f"🚨 [{ts}] {err['source']} - {err['error_type']}"
+
+                with st.expander(label):
+                    st.error(f"**Mensagem:** {err['message']}")
+
+                    c1, c2 = st.columns(2)
+                    c1.metric("Client ID", err["client_id"] or "N/A")
+                    c2.metric("Chat ID", err["chat_id"] or "N/A")
+
+                    # Traceback/contexto só são buscados quando pedidos
+                    if st.toggle("Ver detalhes", key=f"err_det_{err['id']}"):
+                        details = _error_log_details(err["id"])
+                        st.metric("Memória", details.get("memory_usage") or "N/A")
+                        st.text_area(
+                            "Traceback", details.get("traceback"), height=200
+                        )
 
-        except Exception as e:
-            if 'relation "error_logs" does not exist' in str(e):
-                st.warning(
-                    "⚠️ Tabela de logs ainda não criada (será criada no primeiro erro)."
-                )
-            else:
-                st.error(f"Erro ao buscar logs: {e}")
+                        if details.get("context_data"):
+                            st.json(details["context_data"])
+        else:
+            st.success("🎉 Nenhum erro registrado recentemente!")
+
+    except Exception as e:
+        if 'relation "error_logs" does not exist' in str(e):
+            st.warning(
+                "⚠️ Tabela de logs ainda não criada (será criada no primeiro erro)."
+            )
+        else:
+            st.error(f"Erro ao buscar logs: {e}")
@@ -1,13 +1,6 @@
 import streamlit as st
-import os
-import sys
-
-# Ensure root dir is in path for imports
-current_dir = os.path.dirname(os.path.abspath(__file__))
-root_dir = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
-if root_dir not in sys.path:
-    sys.path.insert(0, root_dir)
 
+# sys.path da raiz e ajustado uma vez em views/__init__.py
 from scripts.shared.saas_db import get_connection
 
 
@@ -1,16 +1,139 @@
 import json
 import streamlit as st
-import asyncio
 import os
-import sys
-import base64
+import importlib
+import io
 from datetime import datetime
+from PIL import Image  # Dependência do próprio Streamlit
 
-# Ensure root dir is in path for imports
-current_dir = os.path.dirname(os.path.abspath(__file__))
-root_dir = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
-if root_dir not in sys.path:
-    sys.path.insert(0, root_dir)
+try:
+    import orjson  # Parser em Rust; saídas grandes de tools (busca/RAG) no debug
+except ImportError:
+    orjson = None
+
+# sys.path da raiz e ajustado uma vez em views/__init__.py
+from scripts.shared.saas_db import dumps_json
+from views.client_dashboard.components.async_loop import run_async
+
+_json_loads = orjson.loads if orjson is not None else json.loads
+
+# Quantas imagens (miniaturas) o histórico da sessão mantém
+MAX_KEEP_IMAGES = 4
+
+# Hot reload do backend no simulador (só em dev: SIM_HOT_RELOAD=1)
+_HOT_RELOAD = os.getenv("SIM_HOT_RELOAD") == "1"
+
+
+@st.cache_resource
+def _get_saas_callables():
+    """
+    Importa ask_saas/get_enabled_tools uma única vez por processo.
+    Preserva o estado de módulo (clientes LLM, sessões HTTP) entre os turnos.
+    """
+    from scripts.shared.chains_saas import ask_saas
+    from scripts.shared.tools_library import get_enabled_tools
+
+    return ask_saas, get_enabled_tools
+
+
+@st.cache_resource(ttl=300, show_spinner=False)
+def _enabled_tools(chat_sim_id, config_key, _tools_cfg, _client_config):
+    """
+    Tools do simulador cacheadas por (chat, config serializada).
+    TTL curto porque get_enabled_tools também lê as credenciais do provider no banco.
+    """
+    _, get_enabled_tools = _get_saas_callables()
+    return get_enabled_tools(
+        _tools_cfg, chat_id=chat_sim_id, client_config=_client_config
+    )
+
+
+def _reload_saas_modules():
+    """Recarrega o código do backend (uso em desenvolvimento)."""
+    import scripts.shared.chains_saas
+    import scripts.shared.tools_library
+
+    importlib.reload(scripts.shared.chains_saas)
+    importlib.reload(scripts.shared.tools_library)
+    _get_saas_callables.clear()
+    _enabled_tools.clear()
+
+
+def _thumbnail(img_bytes: bytes, max_side: int = 400) -> bytes:
+    """
+    Miniatura JPEG para o histórico da sessão (exibida com width=200).
+    Evita guardar a imagem original (MBs) em st.session_state a cada turno.
+    """
+    try:
+        im = Image.open(io.BytesIO(img_bytes))
+        im.thumbnail((max_side, max_side))
+        buf = io.BytesIO()
+        im.convert("RGB").save(buf, format="JPEG", quality=80)
+        return buf.getvalue()
+    except Exception:
+        return img_bytes
+
+
+def _ai_debug(m):
+    """Tool Call (AI Message com tool_calls)."""
+    return [
+        (f"🛠️ **Chamando Tool:** `{tc['name']}`", "json", tc["args"])
+        for tc in getattr(m, "tool_calls", None) or ()
+    ]
+
+
+def _tool_debug(m):
+    """Tool Output (ToolMessage)."""
+    title = f"✅ **Resultado ({m.name}):**"
+    content = m.content
+    # Conteúdo já estruturado vai direto, sem ida e volta por string
+    if isinstance(content, (dict, list)):
+        return [(title, "json", content)]
+    # Tenta mostrar JSON bonito se der, senao texto (só tenta se parece JSON)
+    if isinstance(content, str) and content[:1] in "{[":
+        try:
+            return [(title, "json", _json_loads(content))]
+        except ValueError:
+            pass
+    return [(title, "text", content)]
+
+
+_DEBUG_BUILDERS = {"ai": _ai_debug, "tool": _tool_debug}
+
+
+def _build_debug(debug_msgs):
+    """Monta uma vez a lista (título, tipo, corpo) do debug de tools."""
+    items = []
+    for m in debug_msgs:
+        build = _DEBUG_BUILDERS.get(m.type)
+        if build:
+            items.extend(build(m))
+    return items
+
+
+def _render_debug(items, key):
+    """Debug de tools sob demanda: nada é renderizado com o toggle desligado."""
+    if not st.toggle("🧠 Processo de Pensamento (Debug Tools)", key=key):
+        return
+    for title, kind, body in items:
+        st.markdown(title)
+        if kind == "json":
+            st.json(body)
+        else:
+            st.text(body)
+
+
+@st.fragment
+def _render_history():
+    """Histórico do chat isolado num fragment (repinta sem reexecutar a aba)."""
+    for i, msg in enumerate(st.session_state.messages):
+        with st.chat_message(msg["role"]):
+            st.markdown(msg["content"])
+            # Se for mensagem de imagem do usuario (simulada)
+            if msg.get("image_data"):
+                st.image(msg["image_data"], caption="Imagem enviada", width=200)
+            if msg.get("debug"):
+                _render_debug(msg["debug"], key=f"sim_debug_{i}")
 
 
 def render_simulator_tab(user_data):
@@ -25,17 +148,17 @@ def render_simulator_tab(user_data):
         uploaded_audio = st.file_uploader(
             "Enviar Áudio", type=["mp3", "wav", "ogg", "m4a"]
         )
+        if _HOT_RELOAD and st.button(
+            "♻️ Recarregar código",
+            help="Recarrega chains_saas e tools_library (e o cache de tools)",
+        ):
+            _reload_saas_modules()
 
     # --- CHAT HISTORY ---
     if "messages" not in st.session_state:
         st.session_state.messages = []
 
-    for msg in st.session_state.messages:
-        with st.chat_message(msg["role"]):
-            st.markdown(msg["content"])
-            # Se for mensagem de imagem do usuario (simulada)
-            if msg.get("image_data"):
-                st.image(msg["image_data"], caption="Imagem enviada", width=200)
+    _render_history()
 
     # --- INPUT ---
     prompt_text = st.chat_input("Pergunte algo ao seu bot...")
@@ -45,16 +168,17 @@ def render_simulator_tab(user_data):
 
     if should_send:
         # 1. Processa Inputs
-        image_b64 = None
+        client_id = user_data["id"]
+        system_prompt = user_data["system_prompt"]
+        img_bytes = None
+        image_mime = None
         audio_bytes = None
         display_text = prompt_text or ""
 
         if uploaded_image:
-            import io
-
-            # Convert to Base64 for API
+            # Bytes crus para a API (ask_saas gera o base64 fora do event loop)
             img_bytes = uploaded_image.getvalue()
-            image_b64 = base64.b64encode(img_bytes).decode("utf-8")
+            image_mime = uploaded_image.type or "image/jpeg"
             display_text += " [Imagem Enviada]"
 
         if uploaded_audio:
@@ -70,90 +194,77 @@ def render_simulator_tab(user_data):
         user_msg_obj = {"role": "user", "content": display_text}
 
         # Save image for display history (not persistent, just session)
-        if uploaded_image:
-            user_msg_obj["image_data"] = uploaded_image.getvalue()
+        if img_bytes:
+            user_msg_obj["image_data"] = _thumbnail(img_bytes)
 
         st.session_state.messages.append(user_msg_obj)
 
         with st.chat_message("user"):
             st.markdown(display_text)
-            if uploaded_image:
-                st.image(uploaded_image, width=200)
-            if uploaded_audio:
-                st.audio(uploaded_audio)
+            if img_bytes:
+                st.image(img_bytes, width=200)
+            if audio_bytes:
+                st.audio(audio_bytes, format=uploaded_audio.type)
 
         # Generate Answer
         with st.chat_message("assistant"):
-            with st.spinner("Pensando..."):
-                # Importa Ask SaaS
+            # Sem streaming de tokens: ask_saas precisa do resultado completo do agente
+            # (síntese de loop, auto-correção); o spinner ao menos mostra o tempo.
+            with st.spinner("Pensando...", show_time=True):
+                # Importa Ask SaaS (cacheado; em dev, recarregue pelo botão da sidebar)
                 try:
-                    import importlib
-                    import scripts.shared.chains_saas
-                    import scripts.shared.tools_library
-
-                    importlib.reload(scripts.shared.chains_saas)
-                    importlib.reload(scripts.shared.tools_library)
-
-                    from scripts.shared.chains_saas import ask_saas
-                    from scripts.shared.tools_library import get_enabled_tools
+                    ask_saas, _ = _get_saas_callables()
 
                     # Mock Config Completo
                     tools_cfg = user_data.get("tools_config", {})
                     mock_config = {
                         "gemini_store_id": user_data.get("store_id"),
-                        "id": user_data.get("id"),
+                        "id": client_id,
                         "api_url": user_data.get("api_url", ""),
                         "token": user_data.get("token", ""),
                         "tools_config": tools_cfg,
                     }
 
                     # Gera Tools List para o Simulador
-                    chat_sim_id = f"SIM_{user_data['id']}"
-                    tools_list = get_enabled_tools(
-                        tools_cfg, chat_id=chat_sim_id, client_config=mock_config
+                    chat_sim_id = f"SIM_{client_id}"
+                    tools_list = _enabled_tools(
+                        chat_sim_id,
+                        dumps_json(mock_config, sort_keys=True),
+                        tools_cfg,
+                        mock_config,
                     )
 
+                    # Prompt com data/hora montado uma vez, fora da coroutine
+                    now_str = datetime.now().strftime("%d/%m/%Y %H:%M")
+                    full_system_prompt = f"Data/Hora Atual: {now_str}\n\n{system_prompt}"
+
                     # Loop assincrono pra rodar ask_saas
                     # Agora suporta args multimodais E Tools
                     # Retorna response, usage e histórico de mensagens (debug)
-                    response, usage, debug_msgs = asyncio.run(
+                    # Imagem vai como bytes crus; o base64 é feito no backend
+                    response, usage, debug_msgs = run_async(
                         ask_saas(
                             query=prompt_text
                             if prompt_text
                             else "",  # Backend lida com vazio se tiver audio
                             chat_id=chat_sim_id,
-                            system_prompt=f"Data/Hora Atual: {datetime.now().strftime('%d/%m/%Y %H:%M')}\n\n{user_data['system_prompt']}",
+                            system_prompt=full_system_prompt,
                             client_config=mock_config,
                             tools_list=tools_list,
-                            image_base64=image_b64,
                             audio_bytes=audio_bytes,
+                            image_bytes=img_bytes,
+                            image_mime=image_mime,
                         )
                     )
 
-                    # Exibe Logs de Pensamento (Tools)
+                    # Exibe Logs de Pensamento (Tools), montados uma única vez
+                    assistant_msg = {"role": "assistant", "content": response}
                     if debug_msgs:
-                        with st.expander("🧠 Processo de Pensamento (Debug Tools)"):
-                            for m in debug_msgs:
-                                # Se for Tool Call (AI Message com tool_calls)
-                                if (
-                                    m.type == "ai"
-                                    and hasattr(m, "tool_calls")
-                                    and m.tool_calls
-                                ):
-                                    for tc in m.tool_calls:
-                                        st.markdown(
-                                            f"🛠️ **Chamando Tool:** `{tc['name']}`"
-                                        )
-                                        st.json(tc["args"])
-
-                                # Se for Tool Output (ToolMessage)
-                                elif m.type == "tool":
-                                    st.markdown(f"✅ **Resultado ({m.name}):**")
-                                    # Tenta mostrar JSON bonito se der, senao texto
-                                    try:
-                                        st.json(json.loads(m.content))
-                                    except:
-                                        st.text(m.content)
+                        assistant_msg["debug"] = _build_debug(debug_msgs)
+                        _render_debug(
+                            assistant_msg["debug"],
+                            key=f"sim_debug_{len(st.session_state.messages)}",
+                        )
 
                     # Exibe resposta
                     st.markdown(response)
@@ -163,9 +274,15 @@ def render_simulator_tab(user_data):
                         with st.expander("Metadados de Consumo"):
                             st.json(usage)
 
-                    st.session_state.messages.append(
-                        {"role": "assistant", "content": response}
-                    )
+                    st.session_state.messages.append(assistant_msg)
+
+                    # Descarta imagens antigas do histórico (mantém as últimas N)
+                    kept = 0
+                    for msg in reversed(st.session_state.messages):
+                        if "image_data" in msg:
+                            kept += 1
+                            if kept > MAX_KEEP_IMAGES:
+                                msg.pop("image_data")
 
                     # Limpa uploaders (hacky in streamlit, requires Key reset or similar, but for sim is fine)
                     # Para produção ideal, usariamos st.session_state keys + callbacks para limpar.
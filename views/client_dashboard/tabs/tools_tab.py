@@ -7,22 +7,19 @@ Secoes especiais (LancePilot, WhatsApp Avancado, Seguranca, Debug) permanecem ma
 """
 
 import os
-import sys
-import json
+import asyncio
+from functools import lru_cache
 import streamlit as st
 
-# Ensure root dir is in path for imports
-current_dir = os.path.dirname(os.path.abspath(__file__))
-root_dir = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
-if root_dir not in sys.path:
-    sys.path.insert(0, root_dir)
-
-from scripts.shared.saas_db import (  # noqa: E402
-    get_connection,
-    get_provider_config,
-    upsert_provider_config,
+# sys.path da raiz e ajustado uma vez em views/__init__.py
+from scripts.shared.tool_registry import TOOL_REGISTRY, get_tools_for_business_type
+from scripts.lancepilot.client import LancePilotClient
+from scripts.uazapi.uazapi_saas import send_whatsapp_reaction
+from views.client_dashboard.components.config_utils import (
+    cached_provider_config,
+    save_provider_config,
+    save_tools_config_many,
 )
-from scripts.shared.tool_registry import TOOL_REGISTRY, get_tools_for_business_type  # noqa: E402
 
 # Backward compat: Map de keys antigas -> keys novas
 _KEY_ALIASES = {
@@ -30,6 +27,48 @@ _KEY_ALIASES = {
 }
 
 
+# Keys dos widgets por tool, montadas uma vez no import (fora do rerun)
+_WIDGET_KEYS = {
+    tool: {
+        "toggle": f"toggle_{tool}",
+        "instructions": f"instructions_{tool}",
+        "fields": {fn: f"{tool}_{fn}" for fn in meta.get("config_fields", {})},
+    }
+    for tool, meta in TOOL_REGISTRY.items()
+}
+
+
+@lru_cache(maxsize=None)
+def _allowed_tools(business_type: str) -> frozenset:
+    """Nomes das tools aplicaveis ao tipo de negocio (registry e estatico)."""
+    return frozenset(get_tools_for_business_type(business_type))
+
+
+@lru_cache(maxsize=None)
+def _inactive_defaults(tool_name: str) -> tuple:
+    """Pares (campo, valor) salvos quando a tool esta desativada."""
+    defaults = []
+    for field_name, field_meta in TOOL_REGISTRY[tool_name].get(
+        "config_fields", {}
+    ).items():
+        ftype = field_meta.get("type", "text")
+        if ftype == "toggle":
+            defaults.append((field_name, field_meta.get("default", False)))
+        elif ftype == "number":
+            defaults.append((field_name, field_meta.get("default", 0)))
+        elif ftype == "select":
+            defaults.append((field_name, field_meta.get("default", "")))
+        else:
+            defaults.append((field_name, ""))
+    return tuple(defaults)
+
+
+@st.cache_resource(max_entries=32)
+def _get_lp_client(token: str) -> LancePilotClient:
+    """Cliente LancePilot reutilizado por token entre reruns."""
+    return LancePilotClient(token=token)
+
+
 # ─── Generic Field Renderer ───────────────────────────────────────────────
 
 
@@ -44,13 +83,14 @@ def _render_config_fields(
     """
     values = {}
     field_items = list(config_fields.items())
+    field_keys = _WIDGET_KEYS[tool_name]["fields"]
 
     # Agrupa campos em colunas de 2 (exceto textarea/toggle que ocupa linha inteira)
     i = 0
     while i < len(field_items):
         field_name, field_meta = field_items[i]
         ftype = field_meta.get("type", "text")
-        wkey = f"{tool_name}_{field_name}"  # Unique Streamlit widget key
+        wkey = field_keys[field_name]  # Unique Streamlit widget key
 
         if ftype in ("textarea",):
             values[field_name] = st.text_area(
@@ -104,7 +144,7 @@ def _render_config_fields(
                 "type", "text"
             ) in ("text", "password"):
                 next_name, next_meta = field_items[i + 1]
-                next_key = f"{tool_name}_{next_name}"
+                next_key = field_keys[next_name]
                 col1, col2 = st.columns(2)
                 with col1:
                     values[field_name] = st.text_input(
@@ -140,24 +180,32 @@ def _render_config_fields(
     return values
 
 
+def _load_tool_cfg(t_config: dict, tool_name: str) -> dict:
+    """
+    Config salva de uma tool (com backward compat para keys antigas).
+    Um bool salvo (inclusive False) vale como {"active": bool}; so cai para a
+    key antiga quando a atual nao existe ou esta vazia.
+    """
+    current_cfg = t_config.get(tool_name)
+    if (current_cfg is None or current_cfg == {}) and tool_name in _KEY_ALIASES:
+        current_cfg = t_config.get(_KEY_ALIASES[tool_name])
+    if isinstance(current_cfg, bool):
+        current_cfg = {"active": current_cfg}
+    return current_cfg or {}
+
+
 def _render_tool_section(tool_name: str, meta: dict, t_config: dict) -> tuple:
     """
-    Renderiza uma secao de tool completa (header, toggle, campos, instrucoes).
+    Renderiza uma secao de tool completa (toggle, campos, instrucoes).
+    O titulo fica no expander que envolve a secao (ver render_tools_tab).
     Retorna (is_active, config_dict) para salvar depois.
     """
     # Load existing config (com backward compat para keys antigas)
-    current_cfg = t_config.get(tool_name, {})
-    if not current_cfg and tool_name in _KEY_ALIASES:
-        current_cfg = t_config.get(_KEY_ALIASES[tool_name], {})
-    if isinstance(current_cfg, bool):
-        current_cfg = {"active": current_cfg}
+    current_cfg = _load_tool_cfg(t_config, tool_name)
 
     # Special: RAG has default=True
     default_active = meta.get("default_active", False)
 
-    # Header
-    st.subheader(meta["label"])
-
     # Provider badge
     badge = meta.get("provider_badge")
     if badge:
@@ -168,7 +216,7 @@ def _render_tool_section(tool_name: str, meta: dict, t_config: dict) -> tuple:
         f"Ativar {meta['label']}",
         value=current_cfg.get("active", default_active),
         help=meta.get("ui_help", None),
-        key=f"toggle_{tool_name}",
+        key=_WIDGET_KEYS[tool_name]["toggle"],
     )
 
     # Config fields + instructions (shown only when active)
@@ -196,7 +244,7 @@ def _render_tool_section(tool_name: str, meta: dict, t_config: dict) -> tuple:
                 height=100,
                 placeholder=meta.get("instructions_placeholder", ""),
                 help="Essas instrucoes serao adicionadas ao prompt da IA.",
-                key=f"instructions_{tool_name}",
+                key=_WIDGET_KEYS[tool_name]["instructions"],
             )
 
         # Caption
@@ -205,16 +253,7 @@ def _render_tool_section(tool_name: str, meta: dict, t_config: dict) -> tuple:
             st.caption(caption)
     else:
         # When inactive, use empty/default values
-        for field_name, field_meta in meta.get("config_fields", {}).items():
-            ftype = field_meta.get("type", "text")
-            if ftype == "toggle":
-                field_values[field_name] = field_meta.get("default", False)
-            elif ftype == "number":
-                field_values[field_name] = field_meta.get("default", 0)
-            elif ftype == "select":
-                field_values[field_name] = field_meta.get("default", "")
-            else:
-                field_values[field_name] = ""
+        field_values = dict(_inactive_defaults(tool_name))
 
     # Build save dict
     save_dict = {"active": is_active, **field_values}
@@ -231,7 +270,7 @@ def _render_lancepilot_section(user_data: dict):
     """Renderiza secao LancePilot (provider especial, nao e tool do registry)."""
     st.subheader("LancePilot (WhatsApp Oficial)")
 
-    lp_cfg = get_provider_config(str(user_data["id"]), "lancepilot") or {}
+    lp_cfg = cached_provider_config(str(user_data["id"]), "lancepilot")
     if not lp_cfg:
         lp_cfg = {
             "token": user_data.get("lancepilot_token", "") or "",
@@ -270,13 +309,7 @@ def _render_lancepilot_section(user_data: dict):
                     st.warning("Digite o nome do Workspace para buscar.")
                 else:
                     try:
-                        try:
-                            from scripts.lancepilot.client import LancePilotClient
-                        except ImportError:
-                            sys.path.append(root_dir)
-                            from scripts.lancepilot.client import LancePilotClient
-
-                        client = LancePilotClient(token=lp_token)
+                        client = _get_lp_client(lp_token)
                         data = client.get_workspaces(search_query=lp_search)
                         st.session_state[f"lp_workspaces_{user_data['id']}"] = data
                         if data:
@@ -425,17 +458,9 @@ def _render_debug_section(user_data: dict):
                 st.error("Preencha Chat ID e Message ID.")
             else:
                 try:
-                    import asyncio
-
-                    try:
-                        from scripts.uazapi.uazapi_saas import send_whatsapp_reaction
-                    except ImportError:
-                        sys.path.append(os.path.join(root_dir, "scripts", "uazapi"))
-                        from uazapi_saas import send_whatsapp_reaction
-
                     api_key = None
                     api_url = None
-                    prov = get_provider_config(str(user_data["id"]), "uazapi")
+                    prov = cached_provider_config(str(user_data["id"]), "uazapi")
                     if prov:
                         api_key = prov.get("token") or prov.get("key")
                         api_url = prov.get("url")
@@ -497,11 +522,11 @@ def render_tools_tab(user_data):
     raw_btype = user_data.get("business_type")
 
     if raw_btype:
-        allowed_tools = get_tools_for_business_type(raw_btype)
+        allowed_tools = _allowed_tools(raw_btype)
         force_show_all = False
     else:
         # Legacy/Migration mode: mostra tudo se nao tiver tipo definido
-        allowed_tools = {}
+        allowed_tools = frozenset()
         force_show_all = True
 
     # Dict to collect all save configs
@@ -523,21 +548,31 @@ def render_tools_tab(user_data):
             continue  # Nao aplicavel a esse tipo de negocio
 
         meta = TOOL_REGISTRY[tool_name]
-        is_active, tool_save_dict = _render_tool_section(tool_name, meta, t_config)
-        save_configs[tool_name] = tool_save_dict
-
-        # Form Context: mostra webhook URL quando ativo
-        if tool_name == "form_context" and is_active:
-            st.markdown("#### Webhook de Formulario")
-            st.info("Copie a URL abaixo e configure no seu formulario externo (Typeform, landing page, etc.):")
-            api_base = os.getenv("API_BASE_URL", "https://api.aiahub.com.br")
-            form_webhook_url = f"{api_base}/api/v1/forms/{user_data['id']}/submit"
-            st.code(form_webhook_url, language="text")
-            st.caption(
-                "**Metodo:** POST | **Content-Type:** application/json | "
-                "**Requisito:** Incluir campo de telefone (phone, telefone, whatsapp, celular)"
+
+        # Indice compacto: status salvo no titulo (mesma regra do toggle).
+        # O corpo do expander roda mesmo fechado; o ganho e so de layout.
+        saved_active = _load_tool_cfg(t_config, tool_name).get(
+            "active", meta.get("default_active", False)
+        )
+        with st.expander(
+            f"{'✅' if saved_active else '⬜'} {meta['label']}", expanded=False
+        ):
+            is_active, tool_save_dict = _render_tool_section(
+                tool_name, meta, t_config
             )
-            with st.expander("Exemplo de payload", expanded=False):
+            save_configs[tool_name] = tool_save_dict
+
+            # Form Context: mostra webhook URL quando ativo
+            if tool_name == "form_context" and is_active:
+                st.markdown("#### Webhook de Formulario")
+                st.info("Copie a URL abaixo e configure no seu formulario externo (Typeform, landing page, etc.):")
+                api_base = os.getenv("API_BASE_URL", "https://api.aiahub.com.br")
+                form_webhook_url = f"{api_base}/api/v1/forms/{user_data['id']}/submit"
+                st.code(form_webhook_url, language="text")
+                st.caption(
+                    "**Metodo:** POST | **Content-Type:** application/json | "
+                    "**Requisito:** Incluir campo de telefone (phone, telefone, whatsapp, celular)"
+                )
                 st.code(
                     '{\n'
                     '  "nome": "Joao Silva",\n'
@@ -548,7 +583,7 @@ def render_tools_tab(user_data):
                     language="json",
                 )
 
-        st.divider()
+    st.divider()
 
     # ── LancePilot (special section) ──
     c_lp_active, lp_token, lp_workspace_id, lp_number = _render_lancepilot_section(
@@ -566,24 +601,19 @@ def render_tools_tab(user_data):
 
     # ── Save Button ──
     if st.button("Salvar Integracoes"):
-        new_tools_config = t_config.copy()
-
-        # Merge registry tool configs
-        for tool_name, cfg in save_configs.items():
-            new_tools_config[tool_name] = cfg
+        # Merge registry tool configs (preserva keys legadas de t_config);
+        # o helper pula o UPDATE se o tools_config não mudou
+        saved = save_tools_config_many(
+            user_data, save_configs, success_msg=None, unchanged_msg=None
+        )
+        if saved is None:
+            return  # Erro já exibido pelo helper
 
         try:
-            with get_connection() as conn:
-                with conn.cursor() as cur:
-                    cur.execute(
-                        "UPDATE clients SET tools_config = %s WHERE id = %s",
-                        (json.dumps(new_tools_config), user_data["id"]),
-                    )
-
             # Save LancePilot in client_providers
-            upsert_provider_config(
-                client_id=str(user_data["id"]),
-                provider_type="lancepilot",
+            save_provider_config(
+                str(user_data["id"]),
+                "lancepilot",
                 config={
                     "token": lp_token if c_lp_active else "",
                     "workspace_id": lp_workspace_id if c_lp_active else "",
@@ -594,7 +624,6 @@ def render_tools_tab(user_data):
                 is_default=(user_data.get("whatsapp_provider") == "lancepilot"),
             )
 
-            user_data["tools_config"] = new_tools_config
             st.success("Configuracoes salvas!")
         except Exception as e:
             st.error(f"Erro ao salvar: {e}")
@@ -1,23 +1,19 @@
-import json
 import streamlit as st
 import asyncio
+from datetime import date
 import os
-import sys
 
-# Ensure root dir is in path for imports
-current_dir = os.path.dirname(os.path.abspath(__file__))
-root_dir = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
-if root_dir not in sys.path:
-    sys.path.insert(0, root_dir)
-
-from scripts.shared.saas_db import (  # noqa: E402
-    get_connection,
+# sys.path da raiz e ajustado uma vez em views/__init__.py
+from scripts.shared.saas_db import (
     get_inbox_conversations,
     get_messages,
     add_message,
 )
-from views.client_dashboard.styles.inbox_styles import get_inbox_css  # noqa: E402
-from views.client_dashboard.components.inbox_components import (  # noqa: E402
+from views.client_dashboard.components.config_utils import (
+    save_tools_config_many,
+)
+from views.client_dashboard.styles.inbox_styles import get_inbox_css
+from views.client_dashboard.components.inbox_components import (
     format_contact_label,
     render_chat_header,
 )
@@ -313,7 +309,6 @@ def render_whatsapp_tab(user_data):
                     st.error("Preencha WABA ID e Token.")
                 else:
                     # 1. Salva no Banco
-                    new_tools = t_config.copy()
                     existing_wa = t_config.get("whatsapp", {})
                     new_wa = existing_wa.copy()
                     new_wa.update(
@@ -325,17 +320,15 @@ def render_whatsapp_tab(user_data):
                             "mode": "official",
                         }
                     )
-                    new_tools["whatsapp"] = new_wa
-
-                    try:
-                        with get_connection() as conn:
-                            with conn.cursor() as cur:
-                                cur.execute(
-                                    "UPDATE clients SET tools_config = %s WHERE id = %s",
-                                    (json.dumps(new_tools), user_data["id"]),
-                                )
-                        user_data["tools_config"] = new_tools
+                    saved = save_tools_config_many(
+                        user_data,
+                        {"whatsapp": new_wa},
+                        success_msg=None,
+                        unchanged_msg=None,
+                    )
 
+                    # Erro de banco já exibido pelo helper
+                    if saved is not None:
                         # 2. Executa Subscrição na Meta (Subscribe App to WABA)
                         st.subheader("Processando Integração...")
                         try:
@@ -375,9 +368,6 @@ def render_whatsapp_tab(user_data):
                         except Exception as e:
                             st.error(f"Erro na conexão: {e}")
 
-                    except Exception as e:
-                        st.error(f"Erro ao salvar banco: {e}")
-
         if col_verify.button("🔄 Verificar Status"):
             if not token:
                 st.warning("Sem token configurado.")
@@ -853,7 +843,7 @@ def render_whatsapp_tab(user_data):
                             st.error(f"Erro: {e}")
 
     with mt_inbox:
-        # 1. INJECT CUSTOM CSS
+        # 1. INJECT CUSTOM CSS (uma vez, antes da lista: inclui o radio de contatos)
         st.markdown(get_inbox_css(), unsafe_allow_html=True)
 
         st.header("📬 Inbox WhatsApp")
@@ -882,24 +872,37 @@ def render_whatsapp_tab(user_data):
                 if not conversations:
                     st.info("Nenhuma conversa recente.")
 
-                # Renderiza Lista como 'Cards'
-                for conv in conversations:
-                    chat_id = conv["chat_id"]
-
-                    # Usa componente modular para formatar o label
-                    label = format_contact_label(
-                        chat_id,
+                # Renderiza Lista como 'Cards' num único widget (st.radio)
+                # em vez de um st.button por contato: 1 elemento por rerun, não N.
+                today = date.today()  # Parte da chave do cache dos labels
+                labels = {
+                    conv["chat_id"]: format_contact_label(
+                        conv["chat_id"],
                         conv.get("last_message_at"),
                         conv.get("last_role"),
                         conv.get("last_context"),  # Passamos context para preview
+                        today=today,
                     )
+                    for conv in conversations
+                }
 
-                    # Botão estilo Card
-                    if st.button(
-                        label, key=f"chat_btn_{chat_id}", width="stretch"
-                    ):
-                        st.session_state["active_chat_id"] = chat_id
-                        st.rerun()
+                if labels:
+                    chat_ids = list(labels)
+                    current_id = st.session_state.get("active_chat_id")
+                    selected_id = st.radio(
+                        "Conversas",
+                        options=chat_ids,
+                        index=(
+                            chat_ids.index(current_id)
+                            if current_id in labels
+                            else None
+                        ),
+                        format_func=labels.get,
+                        key="inbox_contact_list",
+                        label_visibility="collapsed",
+                    )
+                    if selected_id and selected_id != current_id:
+                        st.session_state["active_chat_id"] = selected_id
 
             # --- COLUNA 2: ÁREA DE CHAT ---
             with c_chat:
@@ -908,7 +911,6 @@ def render_whatsapp_tab(user_data):
                 if not active_id:
                     st.info("👈 Selecione uma conversa para responder.")
                 else:
-                    st.markdown(get_inbox_css(), unsafe_allow_html=True)
                     render_chat_header(active_id)
 
                     # Layout limpo: Botão de Refresh discreto no topo ou apenas confiar na interação